@@ -4,34 +4,53 @@ Copyright 2016 Brian Quach
 Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
 """
 import endpoints
+import os
 
-from protorpc import message_types
 from protorpc import remote
 
-from google.appengine.api import taskqueue
 from google.appengine.ext import ndb
 
+import cache
+import instrumentation
+import leaderboard
+import notifications
+import profiling
+import stats
 from enum import HandState
 from form import CancelGameForm
 from form import CardForm
+from form import ExchangeOddsForm
 from form import GameForm
 from form import GameForms
 from form import GameHistoryForm
 from form import GameHistoryForms
 from form import NewGameForm
+from form import NewGamesForm
 from form import PlayerHandForm
+from form import PlayerHandOddsForm
+from form import PlayerHandOddsRequest
 from form import PlayerHandRequest
 from form import PlayerMoveForm
 from form import PlayerName
 from form import PlayerRankForm
 from form import PlayerRankForms
+from form import PlayerRankRequest
+from form import RequestStatsForm
+from form import RequestStatsForms
+from form import StatsRequest
 from form import StringMessage
 from form import UserForm
 from game import Poker
 from model import Game
 from model import Hand
 from model import User
-from utility import get_by_urlsafe
+from odds import DEFAULT_TRIALS
+from odds import MAX_TRIALS
+from odds import simulate_discard_odds
+from storage import get_storage
+from utility import MAX_NEW_GAMES
+from utility import get_by_urlsafe_and_name
+from utility import get_page_options
 
 
 @endpoints.api(name='poker', version='v1')
@@ -54,12 +73,11 @@ class FiveCardPokerAPI(remote.Service):
             raise endpoints.BadRequestException('A name is required.')
         if not request.email:
             raise endpoints.BadRequestException('An email is required.')
-        if User.query(User.name == request.name).get():
+        user = get_storage().create_user(request.name, request.email)
+        if user is None:
             raise endpoints.ConflictException(
                 'A User with that name already exists!'
             )
-        user = User(name=request.name, email=request.email)
-        user.put()
         return StringMessage(
             message='User {0} created!'.format(request.name)
         )
@@ -73,8 +91,11 @@ class FiveCardPokerAPI(remote.Service):
     )
     def new_game(self, request):
         """Start a new five card poker game"""
-        player_one = User.query(User.name == request.player_one).get()
-        player_two = User.query(User.name == request.player_two).get()
+        players = cache.get_users_by_name(
+            [request.player_one, request.player_two]
+        )
+        player_one = players.get(request.player_one)
+        player_two = players.get(request.player_two)
         err_msg = '{0} does not exist!'
         if not player_one:
             raise endpoints.NotFoundException(
@@ -84,10 +105,69 @@ class FiveCardPokerAPI(remote.Service):
             raise endpoints.NotFoundException(
                 err_msg.format(request.player_two)
             )
-        game_id = Game.allocate_ids(size=1)[0]
+        if player_one.key == player_two.key:
+            raise endpoints.BadRequestException(
+                'A player cannot play against themselves.'
+            )
+        game_id = get_storage().allocate_game_id()
         game = Poker.new_game(player_one.key, player_two.key, game_id)
         return game.to_form()
 
+    @endpoints.method(
+        request_message=NewGamesForm,
+        response_message=GameForms,
+        path='games/new',
+        name='newGames',
+        http_method='POST'
+    )
+    def new_games(self, request):
+        """Start many five card poker games at once, e.g. a tournament round"""
+        if not request.games:
+            raise endpoints.BadRequestException(
+                'At least one game is required.'
+            )
+        if len(request.games) > MAX_NEW_GAMES:
+            raise endpoints.BadRequestException(
+                'At most {0} games can be started at once.'.format(
+                    MAX_NEW_GAMES
+                )
+            )
+        names = set()
+        for new_game in request.games:
+            if new_game.player_one == new_game.player_two:
+                raise endpoints.BadRequestException(
+                    '{0} cannot play against themselves.'.format(
+                        new_game.player_one
+                    )
+                )
+            names.update([new_game.player_one, new_game.player_two])
+        players = cache.get_users_by_name(names)
+        for name in names:
+            if name not in players:
+                raise endpoints.NotFoundException(
+                    '{0} does not exist!'.format(name)
+                )
+
+        game_ids = get_storage().allocate_game_ids(len(request.games))
+        games = Poker.new_games(
+            [
+                (
+                    players[new_game.player_one].key,
+                    players[new_game.player_two].key
+                )
+                for new_game in request.games
+            ],
+            game_ids
+        )
+        return GameForms(
+            games=Game.to_forms(
+                games,
+                names=dict(
+                    (player.key, player.name) for player in players.values()
+                )
+            )
+        )
+
     @endpoints.method(
         request_message=PlayerMoveForm,
         response_message=StringMessage,
@@ -97,8 +177,9 @@ class FiveCardPokerAPI(remote.Service):
     )
     def make_move(self, request):
         """Make a move."""
-        game = get_by_urlsafe(request.game_urlsafe_key, Game)
-        player = User.query(User.name == request.player).get()
+        game, player = get_by_urlsafe_and_name(
+            request.game_urlsafe_key, Game, request.player
+        )
         if not player:
             raise endpoints.NotFoundException(
                 '{0} does not exist!'.format(request.player)
@@ -127,13 +208,14 @@ class FiveCardPokerAPI(remote.Service):
     )
     def get_user_games(self, request):
         """Get all active user games."""
-        player = User.query(User.name == request.player).get()
+        player = cache.get_user_by_name(request.player)
         if not player:
             raise endpoints.NotFoundException(
                 '{0} does not exist!'.format(request.player)
             )
 
-        games = Game.query(
+        limit, cursor = get_page_options(request.limit, request.cursor)
+        games, next_cursor, more = Game.query(
             ndb.AND(
                 Game.game_over == False,  # noqa
                 ndb.OR(
@@ -141,9 +223,10 @@ class FiveCardPokerAPI(remote.Service):
                     Game.player_two == player.key
                 )
             )
-        )
+        ).order(Game.key).fetch_page(limit, start_cursor=cursor)
         return GameForms(
-            games=[game.to_form() for game in games]
+            games=Game.to_forms(games),
+            next_cursor=next_cursor.urlsafe() if more and next_cursor else None
         )
 
     @endpoints.method(
@@ -155,8 +238,9 @@ class FiveCardPokerAPI(remote.Service):
     )
     def cancel_game(self, request):
         """Player forfeits game."""
-        game = get_by_urlsafe(request.game_urlsafe_key, Game)
-        player = User.query(User.name == request.player).get()
+        game, player = get_by_urlsafe_and_name(
+            request.game_urlsafe_key, Game, request.player
+        )
         if not player:
             raise endpoints.NotFoundException(
                 '{0} does not exist!'.format(request.player)
@@ -167,57 +251,65 @@ class FiveCardPokerAPI(remote.Service):
             )
 
         if game.player_one == player.key:
-            game.winner = game.player_two
+            opponent = cache.get_user(game.player_two)
         else:
-            game.winner = game.player_one
-        game.game_over = True
-        game.is_forfeit = True
-        game.active_player = None
-        game.put()
-        Poker.update_player_stats(game)
-
-        # Notify the opponent that they have won
-
-        taskqueue.add(
-            url='/tasks/send_player_forfeit_email',
-            params={
-                'game_key': game.key.urlsafe(),
-                'winner_key': game.winner.urlsafe(),
-                'loser_name': player.name
-            }
-        )
+            opponent = cache.get_user(game.player_one)
+        Poker.forfeit_game(game, player, opponent)
 
         return StringMessage(message='You have forfeited the game!')
 
     @endpoints.method(
-        request_message=message_types.VoidMessage,
+        request_message=PlayerRankRequest,
         response_message=PlayerRankForms,
         path='user/ranking',
         name='getUserRankings',
         http_method='GET'
     )
     def get_user_rankings(self, request):
-        """Get player stats and ranking based on total points earned."""
-        player_rankings = User.query().order(-User.points)
+        """Get the top players and a player's rank by total points earned."""
+        limit, _ = get_page_options(request.limit, None)
 
-        player_rank = 1
-        player_rank_forms = []
-        for player in player_rankings:
-            player_stats = '{0}-{1}-{2} (Wins-Ties-Losses)'.format(
-                player.wins, player.ties, player.losses
+        def get_player_rank_form(name, player_stats, rank):
+            return PlayerRankForm(
+                name=name,
+                stats='{0}-{1}-{2} (Wins-Ties-Losses)'.format(
+                    player_stats.wins, player_stats.ties, player_stats.losses
+                ),
+                points=player_stats.points,
+                rank=rank
             )
+
+        # Players with the same points share a rank.
+
+        player_rank_forms = []
+        player_rank = 1
+        previous_points = None
+        for position, player in enumerate(
+                User.query().order(-User.points).fetch(limit), 1):
+            if player.points != previous_points:
+                player_rank = position
+                previous_points = player.points
             player_rank_forms.append(
-                PlayerRankForm(
-                    name=player.name,
-                    stats=player_stats,
-                    points=player.points,
-                    rank=player_rank
+                get_player_rank_form(player.name, player, player_rank)
+            )
+
+        requested_player_rank_form = None
+        if request.player:
+            player = cache.get_user_by_name(request.player)
+            if not player:
+                raise endpoints.NotFoundException(
+                    '{0} does not exist!'.format(request.player)
                 )
+            player_stats = stats.get_player_stats(player)
+            requested_player_rank_form = get_player_rank_form(
+                player.name,
+                player_stats,
+                leaderboard.get_rank(player_stats.points)
             )
-            player_rank += 1
 
         return PlayerRankForms(
-            player_ranks=player_rank_forms
+            player_ranks=player_rank_forms,
+            player_rank=requested_player_rank_form
         )
 
     @endpoints.method(
@@ -229,13 +321,14 @@ class FiveCardPokerAPI(remote.Service):
     )
     def get_game_history(self, request):
         """Get player game history."""
-        player = User.query(User.name == request.player).get()
+        player = cache.get_user_by_name(request.player)
         if not player:
             raise endpoints.NotFoundException(
                 '{0} does not exist!'.format(request.player)
             )
 
-        games = Game.query(
+        limit, cursor = get_page_options(request.limit, request.cursor)
+        games, next_cursor, more = Game.query(
             ndb.AND(
                 Game.game_over == True,  # noqa
                 ndb.OR(
@@ -243,12 +336,43 @@ class FiveCardPokerAPI(remote.Service):
                     Game.player_two == player.key
                 )
             )
-        )
+        ).order(Game.key).fetch_page(limit, start_cursor=cursor)
+
+        def get_hand_repr(hand):
+            return repr(Poker.load_player_hand(hand)) if hand else None
 
         game_histories = []
         for game in games:
+            summary = game.summary
+            if summary is not None:
+                game_histories.append(
+                    GameHistoryForm(
+                        game_urlsafe_key=game.key.urlsafe(),
+                        player_one=summary.player_one,
+                        player_one_start_hand=get_hand_repr(
+                            summary.player_one_start_hand
+                        ),
+                        player_one_end_hand=get_hand_repr(
+                            summary.player_one_end_hand
+                        ),
+                        player_two=summary.player_two,
+                        player_two_start_hand=get_hand_repr(
+                            summary.player_two_start_hand
+                        ),
+                        player_two_end_hand=get_hand_repr(
+                            summary.player_two_end_hand
+                        ),
+                        is_forfeit=game.is_forfeit,
+                        winner=summary.winner
+                    )
+                )
+                continue
+
+            # Games finished before summaries were stored.
+
             player_one = game.player_one.get()
             player_two = game.player_two.get()
+            winner = game.winner.get().name if game.winner else None
 
             if game.is_forfeit:
                 game_histories.append(
@@ -257,35 +381,44 @@ class FiveCardPokerAPI(remote.Service):
                         player_one=player_one.name,
                         player_two=player_two.name,
                         is_forfeit=game.is_forfeit,
-                        winner=game.winner.get().name
+                        winner=winner
                     )
                 )
             else:
-                p1_hands = Hand.query(
-                    Hand.game == game.key,
-                    Hand.player == player_one.key
-                )
-                p1_hands = Poker.get_player_start_end_hands(p1_hands)
-                p2_hands = Hand.query(
-                    Hand.game == game.key,
-                    Hand.player == player_two.key
-                )
-                p2_hands = Poker.get_player_start_end_hands(p2_hands)
+                # A missing hand is left out rather than failing the page.
+
+                hands = get_storage().get_game_hands(game)
+
+                def get_game_hand_repr(player_key, state):
+                    hand = hands.get(Hand.get_id(game, player_key, state))
+                    return get_hand_repr(hand.hand) if hand else None
+
+                starting = HandState.STARTING.name
+                ending = HandState.ENDING.name
                 game_histories.append(
                     GameHistoryForm(
                         game_urlsafe_key=game.key.urlsafe(),
                         player_one=player_one.name,
-                        player_one_start_hand=repr(p1_hands[0]),
-                        player_one_end_hand=repr(p1_hands[1]),
+                        player_one_start_hand=get_game_hand_repr(
+                            player_one.key, starting
+                        ),
+                        player_one_end_hand=get_game_hand_repr(
+                            player_one.key, ending
+                        ),
                         player_two=player_two.name,
-                        player_two_start_hand=repr(p2_hands[0]),
-                        player_two_end_hand=repr(p2_hands[1]),
+                        player_two_start_hand=get_game_hand_repr(
+                            player_two.key, starting
+                        ),
+                        player_two_end_hand=get_game_hand_repr(
+                            player_two.key, ending
+                        ),
                         is_forfeit=game.is_forfeit,
-                        winner=game.winner.get().name
+                        winner=winner
                     )
                 )
         return GameHistoryForms(
-            games=game_histories
+            games=game_histories,
+            next_cursor=next_cursor.urlsafe() if more and next_cursor else None
         )
 
     @endpoints.method(
@@ -297,8 +430,9 @@ class FiveCardPokerAPI(remote.Service):
     )
     def get_user_hand(self, request):
         """Get player's most recent hand state for a given game."""
-        game = get_by_urlsafe(request.game_urlsafe_key, Game)
-        player = User.query(User.name == request.player).get()
+        game, player = get_by_urlsafe_and_name(
+            request.game_urlsafe_key, Game, request.player
+        )
         if not player:
             raise endpoints.NotFoundException(
                 '{0} does not exist!'.format(request.player)
@@ -317,19 +451,13 @@ class FiveCardPokerAPI(remote.Service):
                 )
             return card_forms
 
-        cards = []
-        state = 'STARTING'
-        hands = Hand.query(
-            Hand.game == game.key, Hand.player == player.key
-        ).fetch()
-
-        if len(hands) == 1:
-            cards = get_card_form(hands[0])
-        else:
-            state = 'ENDING'
-            for hand in hands:
-                if hand.state == HandState.ENDING.name:
-                    cards = get_card_form(hand)
+        state = HandState.ENDING.name
+        hands = get_storage().get_game_hands(game)
+        hand = hands.get(Hand.get_id(game, player.key, state))
+        if hand is None:
+            state = HandState.STARTING.name
+            hand = Poker.get_game_hand(game, hands, player.key, state)
+        cards = get_card_form(hand)
 
         return PlayerHandForm(
             name=player.name,
@@ -337,5 +465,108 @@ class FiveCardPokerAPI(remote.Service):
             state=state
         )
 
+    @endpoints.method(
+        request_message=PlayerHandOddsRequest,
+        response_message=PlayerHandOddsForm,
+        path='game/user/hand/odds',
+        name='getUserHandOdds',
+        http_method='GET'
+    )
+    def get_user_hand_odds(self, request):
+        """Get the chance of winning for each exchange of a starting hand."""
+        trials = DEFAULT_TRIALS if request.trials is None else request.trials
+        if not 1 <= trials <= MAX_TRIALS:
+            raise endpoints.BadRequestException(
+                'Trials must be between 1 and {0}.'.format(MAX_TRIALS)
+            )
+        game, player = get_by_urlsafe_and_name(
+            request.game_urlsafe_key, Game, request.player
+        )
+        if not player:
+            raise endpoints.NotFoundException(
+                '{0} does not exist!'.format(request.player)
+            )
+        if game.player_one != player.key and game.player_two != player.key:
+            raise endpoints.ForbiddenException(
+                '{0} is not part of this game!'.format(request.player)
+            )
+
+        starting_hand = Poker.get_game_hand(
+            game,
+            get_storage().get_game_hands(game),
+            player.key,
+            HandState.STARTING.name
+        )
+        cards = Poker.load_player_hand(starting_hand.hand)
+        with instrumentation.timer('evaluator'):
+            trials, exchange_odds = simulate_discard_odds(cards, trials)
+
+        return PlayerHandOddsForm(
+            name=player.name,
+            cards=[
+                CardForm(name=card.name, suit=card.suit, card_id=card.id)
+                for card in cards
+            ],
+            exchanges=[
+                ExchangeOddsForm(
+                    card_ids_to_exchange=[card.id for card in discards],
+                    win_probability=win_probability,
+                    tie_probability=tie_probability
+                )
+                for discards, win_probability, tie_probability
+                in exchange_odds
+            ],
+            trials=trials
+        )
+
+    @endpoints.method(
+        request_message=StatsRequest,
+        response_message=RequestStatsForms,
+        path='stats/requests',
+        name='getRequestStats',
+        http_method='GET'
+    )
+    def get_request_stats(self, request):
+        """Get latency percentiles and mean RPC counts for each route."""
+        self._check_profile_key()
+        forms = RequestStatsForms(
+            routes=[
+                RequestStatsForm(**route_stats)
+                for route_stats in instrumentation.get_route_stats()
+            ]
+        )
+        if request.reset:
+            instrumentation.reset_route_stats()
+        return forms
+
+    @endpoints.method(
+        request_message=StatsRequest,
+        response_message=StringMessage,
+        path='stats/profile',
+        name='getProfileStats',
+        http_method='GET'
+    )
+    def get_profile_stats(self, request):
+        """Get the aggregated profile of game logic in profiled requests."""
+        self._check_profile_key()
+        message = StringMessage(
+            message=profiling.get_stats_text() or 'No requests were profiled.'
+        )
+        if request.reset:
+            profiling.reset()
+        return message
+
+    def _check_profile_key(self):
+        """Raises ForbiddenException unless the X-Profile header matches the
+        PROFILE_KEY environment variable."""
+        profile_key = os.environ.get('PROFILE_KEY')
+        if (not profile_key or
+                self.request_state.headers.get('X-Profile') != profile_key):
+            raise endpoints.ForbiddenException(
+                'An X-Profile header with the profile key is required.'
+            )
+
 
-api = endpoints.api_server([FiveCardPokerAPI])
+api = instrumentation.InstrumentRequests(profiling.ProfileRequests(
+    notifications.FlushNotifications(endpoints.api_server([FiveCardPokerAPI]))
+))
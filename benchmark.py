@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Microbenchmarks of the card, deck, serialization and evaluation hot paths.
+
+Runs without the App Engine SDK (see offline.py). Results can be saved as a
+JSON baseline and later runs compared against it; a benchmark regresses when
+it is slower than its baseline by more than the baseline's threshold.
+
+Usage:
+  python benchmark.py --save baseline.json
+  python benchmark.py --baseline baseline.json
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+import offline
+offline.install()
+
+import evaluator  # noqa
+from game import Card  # noqa
+from game import Deck  # noqa
+from game import Poker  # noqa
+
+DEFAULT_THRESHOLD = 0.25
+SEED = b'benchmark-seed-0'
+
+# One hand per hand category, plus the Ace low straight which is ranked
+# differently from other straights.
+
+HANDS = (
+    ('high_card', evaluator.HIGH_CARD, (
+        ('two', 'spade'), ('five', 'heart'), ('seven', 'diamond'),
+        ('nine', 'club'), ('king', 'spade'))),
+    ('pair', evaluator.PAIR, (
+        ('two', 'spade'), ('two', 'heart'), ('seven', 'diamond'),
+        ('nine', 'club'), ('king', 'spade'))),
+    ('two_pair', evaluator.TWO_PAIR, (
+        ('two', 'spade'), ('two', 'heart'), ('nine', 'diamond'),
+        ('nine', 'club'), ('king', 'spade'))),
+    ('three_of_a_kind', evaluator.THREE_OF_A_KIND, (
+        ('two', 'spade'), ('two', 'heart'), ('two', 'diamond'),
+        ('nine', 'club'), ('king', 'spade'))),
+    ('straight', evaluator.STRAIGHT, (
+        ('five', 'spade'), ('six', 'heart'), ('seven', 'diamond'),
+        ('eight', 'club'), ('nine', 'spade'))),
+    ('straight_ace_low', evaluator.STRAIGHT, (
+        ('ace', 'spade'), ('two', 'heart'), ('three', 'diamond'),
+        ('four', 'club'), ('five', 'spade'))),
+    ('flush', evaluator.FLUSH, (
+        ('two', 'heart'), ('five', 'heart'), ('seven', 'heart'),
+        ('nine', 'heart'), ('king', 'heart'))),
+    ('full_house', evaluator.FULL_HOUSE, (
+        ('two', 'spade'), ('two', 'heart'), ('two', 'diamond'),
+        ('nine', 'club'), ('nine', 'spade'))),
+    ('four_of_a_kind', evaluator.FOUR_OF_A_KIND, (
+        ('two', 'spade'), ('two', 'heart'), ('two', 'diamond'),
+        ('two', 'club'), ('king', 'spade'))),
+    ('straight_flush', evaluator.STRAIGHT_FLUSH, (
+        ('five', 'heart'), ('six', 'heart'), ('seven', 'heart'),
+        ('eight', 'heart'), ('nine', 'heart'))),
+    ('royal_flush', evaluator.ROYAL_FLUSH, (
+        ('ten', 'spade'), ('jack', 'spade'), ('queen', 'spade'),
+        ('king', 'spade'), ('ace', 'spade')))
+)
+
+
+def _make_hand(cards):
+    return [Card(name, suit) for name, suit in cards]
+
+
+def _build_benchmarks():
+    """Returns a list of (benchmark name, function to time)."""
+    seeded_deck = Deck(seed=SEED)
+    seeded_deck.shuffle()
+    random_deck = Deck()
+    deck_bytes = seeded_deck.serialize()
+    hand = seeded_deck.cards[:5]
+    hand_bytes = Poker.serialize_hand(hand)
+    card_ids = [card.id for card in hand[:3]]
+
+    def draw():
+        seeded_deck.position = 0
+        return seeded_deck.draw(5)
+
+    def get_new_cards():
+        seeded_deck.position = 10
+        return Poker.get_new_cards(seeded_deck, list(hand), card_ids)
+
+    benchmarks = [
+        ('Card', lambda: Card('queen', 'heart')),
+        ('Card.create_from_id', lambda: Card.create_from_id('heart_queen')),
+        ('Deck._get_standard_deck', seeded_deck._get_standard_deck),
+        ('Deck.shuffle (seeded)', seeded_deck.shuffle),
+        ('Deck.shuffle (random)', random_deck.shuffle),
+        ('Deck.draw', draw),
+        ('Deck.serialize', seeded_deck.serialize),
+        ('Deck.deserialize', lambda: Deck.deserialize(deck_bytes)),
+        ('Poker.serialize_hand', lambda: Poker.serialize_hand(hand)),
+        ('Poker.load_player_hand', lambda: Poker.load_player_hand(hand_bytes)),
+        ('Poker.get_new_cards', get_new_cards)
+    ]
+
+    opponent = _make_hand(HANDS[0][2])
+    for name, hand_type, cards in HANDS:
+        player_hand = _make_hand(cards)
+        if Poker.determine_hand_type(player_hand) != hand_type:
+            raise AssertionError(
+                'Example {0} hand is misclassified.'.format(name)
+            )
+        benchmarks.append((
+            'Poker.game_outcome ({0})'.format(name),
+            lambda player_hand=player_hand:
+                Poker.game_outcome(player_hand, opponent)
+        ))
+    return benchmarks
+
+
+def time_function(function, repeat=5, min_seconds=0.05):
+    """Returns the fastest time of one call in microseconds.
+
+    The number of calls per timing is raised until a timing takes at least
+    min_seconds; the fastest of repeat timings is used.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= min_seconds:
+            break
+        number *= 10 if seconds < min_seconds / 10 else 2
+    timings = [seconds] + timer.repeat(repeat - 1, number)
+    return min(timings) * 1e6 / number
+
+
+def run(name_filter=None, repeat=5, min_seconds=0.05):
+    """Runs the benchmarks whose name contains name_filter.
+
+    Returns:
+      A dictionary of benchmark name to microseconds per call.
+    """
+    return dict(
+        (name, time_function(function, repeat, min_seconds))
+        for name, function in _build_benchmarks()
+        if not name_filter or name_filter in name
+    )
+
+
+def make_baseline(results, threshold=DEFAULT_THRESHOLD):
+    """Returns a baseline for results; thresholds can be edited per entry."""
+    return {
+        'python': platform.python_version(),
+        'benchmarks': dict(
+            (name, {'us_per_call': us_per_call, 'threshold': threshold})
+            for name, us_per_call in results.items()
+        )
+    }
+
+
+def compare(results, baseline):
+    """Compares results with a baseline.
+
+    Returns:
+      A list of (name, microseconds per call, baseline microseconds,
+      threshold) for every benchmark slower than its baseline allows.
+    """
+    regressions = []
+    for name, us_per_call in sorted(results.items()):
+        entry = baseline['benchmarks'].get(name)
+        if entry is None:
+            continue
+        threshold = entry.get('threshold', DEFAULT_THRESHOLD)
+        if us_per_call > entry['us_per_call'] * (1 + threshold):
+            regressions.append(
+                (name, us_per_call, entry['us_per_call'], threshold)
+            )
+    return regressions
+
+
+def format_results(results, baseline=None):
+    """Returns a human readable table of results."""
+    lines = []
+    for name, us_per_call in sorted(results.items()):
+        line = '{0:<42} {1:10.3f}us'.format(name, us_per_call)
+        entry = baseline and baseline['benchmarks'].get(name)
+        if entry:
+            line += '  {0:+7.1f}% vs baseline'.format(
+                100.0 * (us_per_call / entry['us_per_call'] - 1)
+            )
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--filter', help='only run benchmarks with this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--save', metavar='PATH', help='save the results as a baseline'
+    )
+    parser.add_argument(
+        '--baseline', metavar='PATH',
+        help='compare with a baseline; exits with 1 on any regression'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='allowed slowdown saved with --save (0.25 is 25%%)'
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='print the results as JSON'
+    )
+    arguments = parser.parse_args()
+
+    results = run(arguments.filter, arguments.repeat)
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if arguments.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(format_results(results, baseline))
+
+    if arguments.save:
+        with open(arguments.save, 'w') as baseline_file:
+            json.dump(
+                make_baseline(results, arguments.threshold),
+                baseline_file,
+                indent=2,
+                sort_keys=True
+            )
+
+    if baseline is not None:
+        regressions = compare(results, baseline)
+        for name, us_per_call, baseline_us, threshold in regressions:
+            print('REGRESSION {0}: {1:.3f}us, baseline {2:.3f}us (+{3:.0%} '
+                  'allowed)'.format(name, us_per_call, baseline_us, threshold),
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
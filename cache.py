@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from collections import OrderedDict
+import pickle
+import time as _time
+
+try:
+    from google.appengine.api import memcache
+except ImportError:
+    memcache = None
+
+import instrumentation
+from storage import get_storage
+
+CACHE_SECONDS = 600
+
+# After an invalidation, read-through adds are refused for this long so a
+# reader that loaded the entity before the write cannot put it back.
+
+DELETE_LOCK_SECONDS = 5
+
+_USER_NAME_PREFIX = 'user-name:'
+_USER_KEY_PREFIX = 'user-key:'
+
+
+class LocalCache(object):
+    """In-process stand-in for the memcache calls this module makes.
+
+    Used when memcache is unavailable, e.g. offline tools. Values are pickled
+    like memcache does, so callers can never change a cached entity in place.
+    The least recently used entries are evicted past max_entries.
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._locks = {}
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires and expires < _now():
+            return None
+        self._entries[key] = entry
+        return pickle.loads(value)
+
+    def set(self, key, value, time=0):
+        self._entries.pop(key, None)
+        self._entries[key] = (
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            _expires(time)
+        )
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, time=0):
+        if self._locks.get(key, 0) > _now() or self.get(key) is not None:
+            return False
+        self._locks.pop(key, None)
+        return self.set(key, value, time)
+
+    def get_multi(self, keys):
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def add_multi(self, mapping, time=0):
+        return [
+            key for key, value in mapping.items()
+            if not self.add(key, value, time)
+        ]
+
+    def delete_multi(self, keys, seconds=0):
+        for key in keys:
+            self._entries.pop(key, None)
+            if seconds:
+                self._locks[key] = _now() + seconds
+        return True
+
+
+def _now():
+    return _time.time()
+
+
+def _expires(seconds):
+    return _now() + seconds if seconds else 0
+
+
+_client = memcache if memcache is not None else LocalCache()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def read_through(cache_key, load):
+    """Returns a cached value, loading and caching it on a miss.
+
+    Nothing is cached when load returns None.
+    """
+    value = _client.get(cache_key)
+    if value is not None:
+        _count(hits=1, misses=0)
+        return value
+    _count(hits=0, misses=1)
+    value = load()
+    if value is not None:
+        _client.add(cache_key, value, time=CACHE_SECONDS)
+    return value
+
+
+def _count(hits, misses):
+    """Adds to the hit and miss counts of the instance and the request."""
+    _stats['hits'] += hits
+    _stats['misses'] += misses
+    instrumentation.count('cache_hits', hits)
+    instrumentation.count('cache_misses', misses)
+
+
+def get_user_by_name(name):
+    """Returns the User with a name or None, reading through the cache."""
+    return read_through(
+        _USER_NAME_PREFIX + name,
+        lambda: get_storage().get_user_by_name(name)
+    )
+
+
+def get_users_by_name(names):
+    """Returns Users by name with one cache lookup and batch gets for misses.
+
+    Returns:
+      A dictionary of name to User; names without a User are left out.
+    """
+    names = set(names)
+    cached = _client.get_multi([_USER_NAME_PREFIX + name for name in names])
+    users = dict(
+        (name, cached[_USER_NAME_PREFIX + name])
+        for name in names if _USER_NAME_PREFIX + name in cached
+    )
+    _count(hits=len(users), misses=len(names) - len(users))
+
+    missing_names = names.difference(users)
+    if missing_names:
+        loaded = get_storage().get_users_by_name(missing_names)
+        _client.add_multi(
+            dict(
+                (_USER_NAME_PREFIX + name, user)
+                for name, user in loaded.items()
+            ),
+            time=CACHE_SECONDS
+        )
+        users.update(loaded)
+    return users
+
+
+def get_entity_and_user_by_name(key, name):
+    """Returns the entity for a key and the User with a name together.
+
+    The entity is read from storage while the User is looked up through the
+    cache. Games change with every move, so they are never cached here;
+    storage (ndb) keeps its own cache of them consistent with the datastore.
+
+    Returns:
+      A tuple of the entity and the User; either may be None.
+    """
+    entity_future = get_storage().get_async(key)
+    user = get_user_by_name(name)
+    return entity_future.get_result(), user
+
+
+def get_user(key):
+    """Returns the User for a key or None, reading through the cache."""
+    return read_through(
+        _USER_KEY_PREFIX + key.urlsafe(),
+        lambda: get_storage().get(key)
+    )
+
+
+def invalidate(cache_keys):
+    """Drops cache entries once the current transaction, if any, commits."""
+    get_storage().on_commit(
+        lambda: _client.delete_multi(cache_keys, seconds=DELETE_LOCK_SECONDS)
+    )
+
+
+def invalidate_users(users):
+    """Drops cached copies of Users after they are written."""
+    cache_keys = []
+    for user in users:
+        cache_keys.append(_USER_NAME_PREFIX + user.name)
+        cache_keys.append(_USER_KEY_PREFIX + user.key.urlsafe())
+    invalidate(cache_keys)
+
+
+def get_stats():
+    """Returns the hit and miss counts of this instance since it started.
+
+    Returns:
+      A dictionary with hits, misses and hit_ratio.
+    """
+    lookups = _stats['hits'] + _stats['misses']
+    return {
+        'hits': _stats['hits'],
+        'misses': _stats['misses'],
+        'hit_ratio': float(_stats['hits']) / lookups if lookups else 0.0
+    }
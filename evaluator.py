@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from collections import Counter
+from itertools import combinations
+from itertools import combinations_with_replacement
+
+# Hand categories, numbered the same as the poker hand rankings in game.py
+# (higher is better).
+
+HIGH_CARD = 1
+PAIR = 2
+TWO_PAIR = 3
+THREE_OF_A_KIND = 4
+STRAIGHT = 5
+FLUSH = 6
+FULL_HOUSE = 7
+FOUR_OF_A_KIND = 8
+STRAIGHT_FLUSH = 9
+ROYAL_FLUSH = 10
+
+CARD_NAMES = (
+    'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+    'jack', 'queen', 'king', 'ace'
+)
+CARD_SUITS = ('spade', 'heart', 'diamond', 'club')
+
+# A card code is an integer from 0 to 51: (index of name * 4) + index of suit.
+# This is the same order Deck builds a standard deck in.
+
+CARD_CODES = dict(
+    ((name, suit), (i * 4) + j)
+    for i, name in enumerate(CARD_NAMES)
+    for j, suit in enumerate(CARD_SUITS)
+)
+
+_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+_WHEEL = (12, 3, 2, 1, 0)
+
+
+def card_code(name, suit):
+    """Returns the card code for a card name and suit or None if unknown."""
+    return CARD_CODES.get((name, suit))
+
+
+def _pack(code):
+    """Packs a card code into bit fields used by the lookup tables.
+
+    Bits 16-28 hold a single bit for the card name, bits 12-15 hold a single
+    bit for the suit and the low byte holds a prime unique to the card name.
+    """
+    name_index, suit_index = divmod(code, 4)
+    return (
+        (1 << (16 + name_index)) |
+        (1 << (12 + suit_index)) |
+        _PRIMES[name_index]
+    )
+
+
+CARD_INTS = tuple(_pack(code) for code in range(52))
+
+
+def _rank(hand_type, key=0):
+    """Combines a hand category and its tie breaker into one integer."""
+    return (hand_type << 8) | key
+
+
+def _distinct_rank(name_indexes, is_flush):
+    """Ranks five cards that all have different names.
+
+    Args:
+      name_indexes: the five card name indexes sorted highest first.
+      is_flush: whether all five cards share a suit.
+
+    Returns:
+      The hand rank.
+    """
+    highest_value = name_indexes[0] + 2
+    if name_indexes == _WHEEL:
+        # Ace low rule: the Ace counts as a one so the Five is the high card.
+        straight_value = 5
+    elif name_indexes[0] - name_indexes[4] == 4:
+        straight_value = highest_value
+    else:
+        straight_value = None
+
+    if is_flush and straight_value is not None:
+        if straight_value == 14:
+            return _rank(ROYAL_FLUSH)
+        return _rank(STRAIGHT_FLUSH, straight_value)
+    if is_flush:
+        return _rank(FLUSH, highest_value)
+    if straight_value is not None:
+        return _rank(STRAIGHT, straight_value)
+    return _rank(HIGH_CARD, highest_value)
+
+
+def _grouped_rank(card_frequencies):
+    """Ranks five cards with at least two of the same name.
+
+    Args:
+      card_frequencies: a list of (card value, count) sorted by count and then
+        by card value, highest first.
+
+    Returns:
+      The hand rank.
+    """
+    counts = tuple(count for _, count in card_frequencies)
+    values = [value for value, _ in card_frequencies]
+    if counts == (4, 1):
+        return _rank(FOUR_OF_A_KIND, values[0])
+    if counts == (3, 2):
+        return _rank(FULL_HOUSE, values[0])
+    if counts == (3, 1, 1):
+        return _rank(THREE_OF_A_KIND, values[0])
+    if counts == (2, 2, 1):
+        return _rank(TWO_PAIR, (values[0] << 4) | values[1])
+    return _rank(PAIR, (values[0] << 4) | values[1])
+
+
+def _build_tables():
+    """Builds the flush, distinct name and prime product lookup tables."""
+    flushes = [0] * 8192
+    unique5 = [0] * 8192
+    products = {}
+    for name_indexes in combinations(range(12, -1, -1), 5):
+        bits = 0
+        for name_index in name_indexes:
+            bits |= 1 << name_index
+        flushes[bits] = _distinct_rank(name_indexes, True)
+        unique5[bits] = _distinct_rank(name_indexes, False)
+
+    for name_indexes in combinations_with_replacement(range(13), 5):
+        counter = Counter(name_indexes)
+        if len(counter) == 5 or max(counter.values()) > 4:
+            continue
+        card_frequencies = sorted(
+            ((name_index + 2, count) for name_index, count in counter.items()),
+            key=lambda frequency: (frequency[1], frequency[0]),
+            reverse=True
+        )
+        product = 1
+        for name_index in name_indexes:
+            product *= _PRIMES[name_index]
+        products[product] = _grouped_rank(card_frequencies)
+    return tuple(flushes), tuple(unique5), products
+
+
+FLUSHES, UNIQUE5, PRODUCTS = _build_tables()
+
+
+def evaluate_ints(a, b, c, d, e):
+    """Returns the rank of five packed cards (see CARD_INTS).
+
+    This is the hot path used by simulations; callers that already hold packed
+    cards skip the code to packed card translation done by evaluate.
+    """
+    bits = (a | b | c | d | e) >> 16
+    if a & b & c & d & e & 0xF000:
+        return FLUSHES[bits]
+    rank = UNIQUE5[bits]
+    if rank:
+        return rank
+    return PRODUCTS[
+        (a & 0xFF) * (b & 0xFF) * (c & 0xFF) * (d & 0xFF) * (e & 0xFF)
+    ]
+
+
+def evaluate(codes):
+    """Ranks a five card hand.
+
+    Hands compare by category first (see hand_type) and then by the same tie
+    breakers the game has always used; a higher rank is a better hand and
+    equal ranks are a tie.
+
+    Args:
+      codes: the five card codes of the hand.
+
+    Returns:
+      An integer rank for the hand.
+
+    Raises:
+      ValueError: codes are not five different card codes.
+    """
+    if len(codes) != 5:
+        raise ValueError('A hand must hold five card codes.')
+    if any(code < 0 or code > 51 for code in codes):
+        raise ValueError('Card codes must be between 0 and 51.')
+    if len(set(codes)) != 5:
+        raise ValueError('A hand must hold five different cards.')
+    a, b, c, d, e = [CARD_INTS[code] for code in codes]
+    return evaluate_ints(a, b, c, d, e)
+
+
+def hand_type(rank):
+    """Returns the hand category (HIGH_CARD to ROYAL_FLUSH) of a hand rank."""
+    return rank >> 8
+
+
+_batch_tables = None
+
+
+def _import_numpy():
+    """Imports NumPy when a batch is first scored; it is optional."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('NumPy is required to score hands in batches.')
+    return numpy
+
+
+def _get_batch_tables(numpy):
+    """Returns the lookup tables as NumPy arrays, building them once."""
+    global _batch_tables
+    if _batch_tables is None:
+        product_keys = numpy.array(sorted(PRODUCTS), dtype=numpy.int64)
+        product_ranks = numpy.array(
+            [PRODUCTS[product] for product in product_keys],
+            dtype=numpy.int32
+        )
+        _batch_tables = (
+            numpy.array(CARD_INTS, dtype=numpy.int64),
+            numpy.array(FLUSHES, dtype=numpy.int32),
+            numpy.array(UNIQUE5, dtype=numpy.int32),
+            product_keys,
+            product_ranks
+        )
+    return _batch_tables
+
+
+def evaluate_batch(hands):
+    """Ranks many five card hands in one vectorized pass.
+
+    Requires NumPy. Ranks are identical to the ones returned by evaluate.
+
+    Args:
+      hands: an (N, 5) array-like of card codes.
+
+    Returns:
+      An N-length NumPy array of hand ranks.
+
+    Raises:
+      ImportError: NumPy is not available.
+      ValueError: hands is not an (N, 5) array of card codes, or a hand
+        holds the same card twice.
+    """
+    numpy = _import_numpy()
+    hands = numpy.asarray(hands, dtype=numpy.int64)
+    if hands.ndim != 2 or hands.shape[1] != 5:
+        raise ValueError('Hands must be an (N, 5) array of card codes.')
+    if hands.size and (hands.min() < 0 or hands.max() > 51):
+        raise ValueError('Card codes must be between 0 and 51.')
+    sorted_hands = numpy.sort(hands, axis=1)
+    if (sorted_hands[:, 1:] == sorted_hands[:, :-1]).any():
+        raise ValueError('A hand must hold five different cards.')
+
+    card_ints, flushes, unique5, product_keys, product_ranks = \
+        _get_batch_tables(numpy)
+    packed = card_ints[hands]
+    bits = numpy.bitwise_or.reduce(packed, axis=1) >> 16
+    is_flush = (numpy.bitwise_and.reduce(packed, axis=1) & 0xF000) != 0
+    ranks = numpy.where(is_flush, flushes[bits], unique5[bits])
+
+    # Hands with repeated card names are ranked by their prime product.
+
+    grouped = ranks == 0
+    if grouped.any():
+        products = numpy.prod(packed[grouped] & 0xFF, axis=1)
+        indexes = numpy.minimum(
+            numpy.searchsorted(product_keys, products), len(product_keys) - 1
+        )
+        if (product_keys[indexes] != products).any():
+            raise ValueError('A hand is not a valid five card hand.')
+        ranks[grouped] = product_ranks[indexes]
+    return ranks
+
+
+def hand_types(ranks):
+    """Returns the hand categories of an array of hand ranks."""
+    return _import_numpy().asarray(ranks) >> 8
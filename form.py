@@ -29,6 +29,11 @@ class NewGameForm(messages.Message):
     player_two = messages.StringField(2, required=True)
 
 
+class NewGamesForm(messages.Message):
+    """Inbound - Used to create many new games at once."""
+    games = messages.MessageField(NewGameForm, 1, repeated=True)
+
+
 class CardForm(messages.Message):
     """Outbound - Used to detail a playing card."""
     name = messages.StringField(1)
@@ -43,6 +48,21 @@ class PlayerHandForm(messages.Message):
     state = messages.StringField(3)
 
 
+class ExchangeOddsForm(messages.Message):
+    """Outbound - Used to detail the chance of winning after an exchange."""
+    card_ids_to_exchange = messages.StringField(1, repeated=True)
+    win_probability = messages.FloatField(2)
+    tie_probability = messages.FloatField(3)
+
+
+class PlayerHandOddsForm(messages.Message):
+    """Outbound - Used to detail the odds of every exchange for a hand."""
+    name = messages.StringField(1)
+    cards = messages.MessageField(CardForm, 2, repeated=True)
+    exchanges = messages.MessageField(ExchangeOddsForm, 3, repeated=True)
+    trials = messages.IntegerField(4)
+
+
 class PlayerMoveForm(messages.Message):
     """Inbound - Used to accept player move."""
     player = messages.StringField(1, required=True)
@@ -59,13 +79,21 @@ class PlayerRankForm(messages.Message):
 
 
 class PlayerRankForms(messages.Message):
-    """Outbound - Represents a list of PlayerRankForms."""
+    """Outbound - Represents the top players and the requested player."""
     player_ranks = messages.MessageField(PlayerRankForm, 1, repeated=True)
+    player_rank = messages.MessageField(PlayerRankForm, 2)
+
+
+class PlayerRankRequest(messages.Message):
+    """Inbound - Used to request the top players and a player's rank."""
+    player = messages.StringField(1)
+    limit = messages.IntegerField(2)
 
 
 class GameForms(messages.Message):
-    """Outbound - Represents a list of games."""
+    """Outbound - Represents a page of games."""
     games = messages.MessageField(GameForm, 1, repeated=True)
+    next_cursor = messages.StringField(2)
 
 
 class CancelGameForm(messages.Message):
@@ -88,8 +116,9 @@ class GameHistoryForm(messages.Message):
 
 
 class GameHistoryForms(messages.Message):
-    """Outbound - Represents a list of a player's game history."""
+    """Outbound - Represents a page of a player's game history."""
     games = messages.MessageField(GameHistoryForm, 1, repeated=True)
+    next_cursor = messages.StringField(2)
 
 
 class StringMessage(messages.Message):
@@ -98,11 +127,47 @@ class StringMessage(messages.Message):
 
 
 class PlayerName(messages.Message):
-    """Outbound - response string message"""
+    """Inbound - Used to request a page of a player's games."""
     player = messages.StringField(1, required=True)
+    limit = messages.IntegerField(2)
+    cursor = messages.StringField(3)
 
 
 class PlayerHandRequest(messages.Message):
     """Inbound - used to query for a player's hand for an active game."""
     player = messages.StringField(1, required=True)
     game_urlsafe_key = messages.StringField(2, required=True)
+
+
+class PlayerHandOddsRequest(messages.Message):
+    """Inbound - used to query for the odds of a player's starting hand."""
+    player = messages.StringField(1, required=True)
+    game_urlsafe_key = messages.StringField(2, required=True)
+    trials = messages.IntegerField(3)
+
+
+class StatsRequest(messages.Message):
+    """Inbound - used to read instance stats and optionally reset them."""
+    reset = messages.BooleanField(1, default=False)
+
+
+class RequestStatsForm(messages.Message):
+    """Outbound - Latency and mean RPC counts of requests to one route."""
+    route = messages.StringField(1)
+    requests = messages.IntegerField(2)
+    wall_ms_p50 = messages.FloatField(3)
+    wall_ms_p90 = messages.FloatField(4)
+    wall_ms_p99 = messages.FloatField(5)
+    datastore_gets = messages.FloatField(6)
+    datastore_puts = messages.FloatField(7)
+    datastore_queries = messages.FloatField(8)
+    task_adds = messages.FloatField(9)
+    memcache_calls = messages.FloatField(10)
+    cache_hits = messages.FloatField(11)
+    cache_misses = messages.FloatField(12)
+    evaluator_ms = messages.FloatField(13)
+
+
+class RequestStatsForms(messages.Message):
+    """Outbound - Represents the request stats of every route."""
+    routes = messages.MessageField(RequestStatsForm, 1, repeated=True)
@@ -3,17 +3,24 @@
 Copyright 2016 Brian Quach
 Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
 """
-from collections import Counter
 import endpoints
-import json
+import hashlib
+import os
 import random
+import struct
 
-from google.appengine.api import taskqueue
 from google.appengine.ext import ndb
 
+import evaluator
+import instrumentation
+import notifications
+import stats
 from enum import HandState
 from model import Game
+from model import GameSummary
 from model import Hand
+from storage import get_storage
+from storage import transactional
 
 
 class Card(object):
@@ -27,122 +34,172 @@ class Card(object):
     card's ID is what the player will use to let the game know which card(s)
     he/she wants to exchange.
 
+    Cards are immutable. The 52 cards of the standard deck are created once at
+    import and constructing a standard card returns the shared instance.
+
     Attributes:
       value: An integer value of a playing card.
       name: A string of the card name.
       suit: A string of the card suit.
       card_id: A string identifying the card.
+      code: An integer from 0 to 51 used by the hand evaluator; None for a
+        card outside the standard deck.
     """
-    def __init__(self, name='joker', suit=None):
-        self.name = name
-        self.suit = suit
-        self.value = self._get_card_value(name)
-        self.id = self._get_card_id(name, suit)
+    __slots__ = ('code', 'name', 'suit', 'value', 'id')
+
+    def __new__(cls, name='joker', suit=None):
+        code = evaluator.card_code(name, suit)
+        if code is not None:
+            return STANDARD_CARDS[code]
+        return cls._create(name, suit, code)
+
+    @classmethod
+    def _create(cls, name, suit, code):
+        """Builds a new card instance; only used to intern the deck."""
+        card = object.__new__(cls)
+        object.__setattr__(card, 'code', code)
+        object.__setattr__(card, 'name', name)
+        object.__setattr__(card, 'suit', suit)
+        object.__setattr__(card, 'value', CARD_VALUES.get(name, 0))
+        object.__setattr__(card, 'id', '{0}_{1}'.format(suit, name))
+        return card
 
     @classmethod
     def create_from_id(cls, card_id=None):
         if card_id is not None:
+            card = _CARDS_BY_ID.get(card_id)
+            if card is not None:
+                return card
             tokens = card_id.split('_')
             suit = tokens[0]
             name = tokens[1]
             return cls(name, suit)
 
+    @classmethod
+    def from_code(cls, code):
+        """Returns the standard card for a card code (0 to 51)."""
+        return STANDARD_CARDS[code]
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Cards are immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError('Cards are immutable.')
+
+    def __reduce__(self):
+        """Pickles by name and suit so standard cards unpickle interned."""
+        return (Card, (self.name, self.suit))
+
     def __repr__(self):
         """Returns a string representing the card."""
         return '{0} of {1}'.format(self.name, self.suit)
 
-    def _get_card_value(self, name):
-        """Gets value of a card based on the name.
+    def serialize(self):
+        """Convert card into a one byte string holding its card code."""
+        return bytes(bytearray((self.code,)))
 
-        Args:
-          name: a string representing the name of the card.
 
-        Returns:
-          The value of a card in a standard 52 card deck. If the card name
-          cannot be found, the vaue of the card will be 0.
+# Card values; the value of a card with an unknown name is 0.
 
-        Raises:
-          KeyError: An error occured trying to find the value of a card.
-        """
-        try:
-            card_values = {
-                'joker': 0,
-                'two': 2,
-                'three': 3,
-                'four': 4,
-                'five': 5,
-                'six': 6,
-                'seven': 7,
-                'eight': 8,
-                'nine': 9,
-                'ten': 10,
-                'jack': 11,
-                'queen': 12,
-                'king': 13,
-                'ace': 14
-            }
-            return card_values[name]
-        except KeyError:
-            return 0
+CARD_VALUES = dict(
+    (name, value) for value, name in enumerate(evaluator.CARD_NAMES, 2)
+)
+CARD_VALUES['joker'] = 0
 
-    def _get_card_id(self, name, suit):
-        """Creates a card's ID.
+STANDARD_CARDS = tuple(
+    Card._create(
+        evaluator.CARD_NAMES[code // 4],
+        evaluator.CARD_SUITS[code % 4],
+        code
+    )
+    for code in range(52)
+)
+_CARDS_BY_ID = dict((card.id, card) for card in STANDARD_CARDS)
 
-        Args:
-          name: A string of the card name.
-          suit: A string of the card suit.
 
-        Returns:
-          A card's ID created from the card name and suit.
-        """
-        return '{0}_{1}'.format(suit, name)
+def encode_cards(cards):
+    """Encodes cards as a byte string holding one card code per byte."""
+    return bytes(bytearray(card.code for card in cards))
 
-    def serialize(self):
-        """Convert card into a JSON string."""
-        card_json = '{{"name": "{0}", "suit": "{1}"}}'.\
-            format(self.name, self.suit)
-        return card_json
+
+def decode_cards(card_bytes):
+    """Decodes a byte string made by encode_cards into a list of cards."""
+    return [STANDARD_CARDS[code] for code in bytearray(card_bytes)]
 
 
 class Deck(object):
     """Represents a collection of cards.
 
+    A deck created with a seed is shuffled into the same order every time, so
+    it can be stored as its seed and the number of cards drawn, and any game
+    can be replayed from its seed.
+
     Attributes:
       cards: a list of Cards.
+      seed: a random byte string the card order is derived from; None for a
+        deck stored card by card.
+      position: the number of cards drawn from the top of the deck.
     """
-    def __init__(self, cards=None):
+    def __init__(self, cards=None, seed=None, position=0):
         self.cards = cards
+        self.seed = seed
+        self.position = position
         if self.cards is None:
             self.cards = self._get_standard_deck()
 
     @classmethod
-    def construct_json_deck(cls, json_deck=None):
-        if json_deck is not None:
-            cards = json.loads(json_deck)
-            cards = [
-                Card(name=card['name'], suit=card['suit']) for card in cards
-            ]
-            return cls(cards)
+    def deserialize(cls, deck_bytes=None):
+        """Creates a deck from the byte string made by Deck.serialize."""
+        if deck_bytes is not None:
+            return cls(decode_cards(deck_bytes))
+
+    @classmethod
+    def from_seed(cls, seed, position=0):
+        """Recreates a seeded deck with position cards already drawn."""
+        deck = cls(seed=seed, position=position)
+        deck.shuffle()
+        return deck
+
+    @staticmethod
+    def new_seed():
+        """Returns a new cryptographically random deck seed."""
+        return os.urandom(16)
 
     def _get_standard_deck(self):
         """Returns the standard 52 card deck unsorted."""
-        cards = []
-        names_of_cards = [
-            'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
-            'nine', 'ten', 'jack', 'queen', 'king', 'ace'
-        ]
-        suit = ['spade', 'heart', 'diamond', 'club']
-        for card_name in names_of_cards:
-            cards.extend(
-                [
-                    Card(name=card_name, suit=suit[i]) for i in range(4)
-                ]
-            )
-        return cards
+        return list(STANDARD_CARDS)
 
     def shuffle(self):
-        """Shuffles the card positions in the deck."""
-        random.shuffle(self.cards)
+        """Shuffles the card positions in the deck.
+
+        Seeded decks use a Fisher-Yates shuffle driven by SHA-256 of the seed,
+        so the order only depends on the seed.
+        """
+        if self.seed is None:
+            random.shuffle(self.cards)
+            return
+
+        seeded_numbers = self._get_seeded_numbers(self.seed)
+        for i in range(len(self.cards) - 1, 0, -1):
+            # Reject numbers past the largest multiple of (i + 1) to keep
+            # every swap position equally likely.
+
+            limit = 0x100000000 - (0x100000000 % (i + 1))
+            number = next(seeded_numbers)
+            while number >= limit:
+                number = next(seeded_numbers)
+            j = number % (i + 1)
+            self.cards[i], self.cards[j] = self.cards[j], self.cards[i]
+
+    @staticmethod
+    def _get_seeded_numbers(seed):
+        """Yields 32-bit numbers from SHA-256 of the seed and a counter."""
+        counter = 0
+        while True:
+            digest = hashlib.sha256(seed + struct.pack('>I', counter)).digest()
+            for number in struct.unpack('>8I', digest):
+                yield number
+            counter += 1
 
     def draw(self, number_of_draws=1):
         """Draw card(s) from the top of the deck.
@@ -156,23 +213,19 @@ class Deck(object):
         Returns:
           An array of cards from the top of the deck.
         """
-        cards_in_deck = len(self.cards)
+        cards_in_deck = len(self.cards) - self.position
         if cards_in_deck < number_of_draws:
             error_message = '''
                 Not enough cards in deck to draw {0}. Deck has {1} cards left.
             '''
             return error_message.format(number_of_draws, cards_in_deck)
-        cards = [self.cards.pop() for i in range(number_of_draws)]
+        cards = self.cards[self.position:self.position + number_of_draws]
+        self.position += number_of_draws
         return cards
 
     def serialize(self):
-        """Convert deck of cards into a JSON string."""
-        deck_json = '['
-        for card in self.cards:
-            deck_json += '{0},'.format(card.serialize())
-        deck_json = deck_json[:-1]
-        deck_json += ']'
-        return deck_json
+        """Convert the undrawn cards into a byte string; one byte per card."""
+        return encode_cards(self.cards[self.position:])
 
 
 class Poker(object):
@@ -202,7 +255,7 @@ class Poker(object):
       player_two: poker player
     """
     @staticmethod
-    @ndb.transactional(xg=True)
+    @transactional
     def new_game(player_one, player_two, game_id):
         """Creates and returns a new game.
 
@@ -214,6 +267,71 @@ class Poker(object):
         Returns:
           A game detailing the players, the active player, and the deck.
         """
+        game, hands = Poker.deal_game(player_one, player_two, game_id)
+        get_storage().put_multi(hands + [game])
+
+        # Send email to active player signaling the start of the game
+
+        notifications.add(
+            url='/tasks/send_move_email',
+            params={
+                'game_key': game.key.urlsafe(),
+                'user_key': game.active_player.urlsafe()
+            },
+            transactional=True
+        )
+        return game
+
+    @staticmethod
+    def new_games(player_pairs, game_ids):
+        """Creates and returns many new games with batched writes.
+
+        Unlike new_game the games are not created in a transaction; all games
+        and hands are saved in one batch put and the move emails are queued
+        in batches once the request ends.
+
+        Args:
+          player_pairs: A list of (player one key, player two key).
+          game_ids: A list of unused Game ids, one per pair of players.
+
+        Returns:
+          The new games in the same order as player_pairs.
+        """
+        games = []
+        entities = []
+        for (player_one, player_two), game_id in zip(player_pairs, game_ids):
+            game, hands = Poker.deal_game(player_one, player_two, game_id)
+            games.append(game)
+            entities.extend(hands)
+            entities.append(game)
+        get_storage().put_multi(entities)
+
+        # Send email to active players signaling the start of their games
+
+        for game in games:
+            notifications.add(
+                url='/tasks/send_move_email',
+                params={
+                    'game_key': game.key.urlsafe(),
+                    'user_key': game.active_player.urlsafe()
+                }
+            )
+        return games
+
+    @staticmethod
+    def deal_game(player_one, player_two, game_id):
+        """Shuffles a deck and deals both players' starting hands.
+
+        Nothing is saved.
+
+        Args:
+          player_one: A key representing player one.
+          player_two: A key representing player two.
+          game_id: A string representing a game_id for generating a Game.key.
+
+        Returns:
+          A tuple of the Game and a list of both players' starting Hands.
+        """
         game_key = ndb.Key(Game, game_id)
 
         game = Game(
@@ -223,43 +341,24 @@ class Poker(object):
             active_player=player_one,
             game_over=False
         )
-        deck = Deck()
+        deck = Deck(seed=Deck.new_seed())
         deck.shuffle()
 
         # Deal out each player's starting hand
 
-        player_one_hand = Poker.serialize_hand(deck.draw(5))
-        hand = Hand(
-            player=player_one,
-            game=game.key,
-            hand=player_one_hand,
-            state=str(HandState.STARTING)
-        )
-        hand.put()
-
-        player_two_hand = Poker.serialize_hand(deck.draw(5))
-        hand = Hand(
-            player=player_two,
-            game=game.key,
-            hand=player_two_hand,
-            state=str(HandState.STARTING)
-        )
-        hand.put()
+        hands = []
+        for player in (player_one, player_two):
+            hands.append(Hand(
+                parent=game.key,
+                id=Hand.get_id(game, player, HandState.STARTING.name),
+                player=player,
+                game=game.key,
+                hand=Poker.serialize_hand(deck.draw(5)),
+                state=str(HandState.STARTING)
+            ))
 
-        game.deck = deck.serialize()
-        game.put()
-
-        # Send email to active player signaling the start of the game
-
-        taskqueue.add(
-            url='/tasks/send_move_email',
-            params={
-                'game_key': game.key.urlsafe(),
-                'user_key': game.active_player.urlsafe()
-            },
-            transactional=True
-        )
-        return game
+        Poker.save_deck(game, deck)
+        return game, hands
 
     @staticmethod
     def make_move(game, player, card_ids):
@@ -280,11 +379,18 @@ class Poker(object):
           ForbiddenException: Player is trying to exchange more than the
             max hand size; 5 cards.
         """
-        final_hand = Hand.query(
-            ndb.AND(Hand.game == game.key, Hand.player == player.key)
-        ).get()
-        final_hand = Poker.load_player_hand(final_hand.hand)
-        deck = Deck.construct_json_deck(game.deck)
+        # Player one's name goes in the summary of the game after player
+        # two's move; get it along with the hands.
+
+        hands_future = get_storage().get_game_hands_async(game)
+        if game.active_player == game.player_two:
+            player_one_future = get_storage().get_async(game.player_one)
+        hands = hands_future.get_result()
+        starting_hand = Poker.get_game_hand(
+            game, hands, player.key, HandState.STARTING.name
+        )
+        final_hand = Poker.load_player_hand(starting_hand.hand)
+        deck = Poker.load_deck(game)
 
         if len(card_ids) > 0:
             if len(card_ids) < 6:
@@ -298,29 +404,52 @@ class Poker(object):
         if game.active_player == game.player_one:
             Poker.save_turn_one_game_state(game, deck, final_hand)
         else:
-            player_one_hand = Hand.query(
-                ndb.AND(Hand.game == game.key, Hand.player == game.player_one)
-            ).get()
+            player_one_hand = Poker.get_game_hand(
+                game, hands, game.player_one, HandState.ENDING.name
+            )
+            summary = GameSummary(
+                player_one=player_one_future.get_result().name,
+                player_two=player.name,
+                player_one_start_hand=Poker.get_game_hand(
+                    game, hands, game.player_one, HandState.STARTING.name
+                ).hand,
+                player_one_end_hand=player_one_hand.hand,
+                player_two_start_hand=starting_hand.hand
+            )
             player_one_hand = Poker.load_player_hand(player_one_hand.hand)
             Poker.save_turn_two_game_state(
                 game,
                 deck,
                 final_hand,
-                player_one_hand
+                player_one_hand,
+                summary
             )
-            Poker.update_player_stats(game)
 
         return final_hand
 
+    @staticmethod
+    def load_deck(game):
+        """Load the game's deck from its seed, or its cards for older games."""
+        if game.deck_seed is not None:
+            return Deck.from_seed(game.deck_seed, game.deck_position)
+        return Deck.deserialize(game.deck)
+
+    @staticmethod
+    def save_deck(game, deck):
+        """Record the deck state on the game.
+
+        Seeded decks only store the draw position after the first save.
+        """
+        if deck.seed is not None:
+            game.deck_seed = deck.seed
+            game.deck_position = deck.position
+        else:
+            game.deck = deck.serialize()
+
     @staticmethod
     def serialize_hand(hand):
-        """Serialize player's hand of cards into JSON."""
-        hand_json = '['
-        for card in hand:
-            hand_json += '{0},'.format(card.serialize())
-        hand_json = hand_json[:-1]
-        hand_json += ']'
-        return hand_json
+        """Serialize player's hand of cards into a byte string."""
+        return encode_cards(hand)
 
     @staticmethod
     def get_new_cards(deck, current_hand, card_ids):
@@ -375,12 +504,11 @@ class Poker(object):
 
     @staticmethod
     def load_player_hand(hand):
-        """Convert the player's hand from JSON into a list of cards objects."""
-        cards = json.loads(hand)
-        return [Card(name=card['name'], suit=card['suit']) for card in cards]
+        """Convert the player's hand from bytes into a list of card objects."""
+        return decode_cards(hand)
 
     @staticmethod
-    @ndb.transactional(xg=True)
+    @transactional
     def save_turn_one_game_state(game, deck, player_one_hand):
         """Save the state of the game after player one has made a move.
 
@@ -396,17 +524,19 @@ class Poker(object):
 
         hand = Poker.serialize_hand(player_one_hand)
         final_hand = Hand(
+            parent=game.key,
+            id=Hand.get_id(game, game.player_one, HandState.ENDING.name),
             player=game.player_one,
             game=game.key,
             hand=hand,
             state=str(HandState.ENDING)
         )
-        final_hand.put()
+        get_storage().put(final_hand)
 
         game.active_player = game.player_two
-        game.deck = deck.serialize()
-        game.put()
-        taskqueue.add(
+        Poker.save_deck(game, deck)
+        get_storage().put(game)
+        notifications.add(
             url='/tasks/send_move_email',
             params={
                 'game_key': game.key.urlsafe(),
@@ -416,8 +546,9 @@ class Poker(object):
         )
 
     @staticmethod
-    @ndb.transactional(xg=True)
-    def save_turn_two_game_state(game, deck, player_two_hand, player_one_hand):
+    @transactional
+    def save_turn_two_game_state(
+            game, deck, player_two_hand, player_one_hand, summary):
         """Save the state of the game after player two has made a move.
 
         This should signal the end of the game.
@@ -429,22 +560,27 @@ class Poker(object):
           player_two_hand: the final hand player two has after the desired
             cards have been replaced.
           player_one_hand: player one's final hand.
+          summary: GameSummary with the player names and every hand but
+            player two's final hand, which is filled in along with the winner.
         """
 
         # Save player two's final hand
 
         hand = Poker.serialize_hand(player_two_hand)
         final_hand = Hand(
+            parent=game.key,
+            id=Hand.get_id(game, game.player_two, HandState.ENDING.name),
             player=game.player_two,
             game=game.key,
             hand=hand,
             state=str(HandState.ENDING)
         )
-        final_hand.put()
+        get_storage().put(final_hand)
 
         # Check game outcome and send email to players with results.
 
-        game_outcome = Poker.game_outcome(player_one_hand, player_two_hand)
+        with instrumentation.timer('evaluator'):
+            game_outcome = Poker.game_outcome(player_one_hand, player_two_hand)
         game.game_over = True
         game.active_player = None
 
@@ -452,11 +588,16 @@ class Poker(object):
             game.winner = None
         elif game_outcome == 1:
             game.winner = game.player_one
+            summary.winner = summary.player_one
         else:
             game.winner = game.player_two
-        game.deck = deck.serialize()
-        game.put()
-        taskqueue.add(
+            summary.winner = summary.player_two
+        summary.player_two_end_hand = hand
+        game.summary = summary
+        Poker.save_deck(game, deck)
+        get_storage().put(game)
+        Poker.update_player_stats(game)
+        notifications.add(
             url='/tasks/send_game_result_email',
             params={
                 'game_key': game.key.urlsafe()
@@ -464,10 +605,54 @@ class Poker(object):
             transactional=True
         )
 
+    @staticmethod
+    @transactional
+    def forfeit_game(game, player, opponent):
+        """Record a player forfeiting the game, giving the win to the opponent.
+
+        Args:
+          game: current game the player is playing in.
+          player: the User forfeiting the game.
+          opponent: the User winning the game.
+        """
+        game.winner = opponent.key
+        game.game_over = True
+        game.is_forfeit = True
+        game.active_player = None
+        if game.player_one == player.key:
+            game.summary = GameSummary(
+                player_one=player.name,
+                player_two=opponent.name,
+                winner=opponent.name
+            )
+        else:
+            game.summary = GameSummary(
+                player_one=opponent.name,
+                player_two=player.name,
+                winner=opponent.name
+            )
+        get_storage().put(game)
+        Poker.update_player_stats(game)
+
+        # Notify the opponent that they have won
+
+        notifications.add(
+            url='/tasks/send_player_forfeit_email',
+            params={
+                'game_key': game.key.urlsafe(),
+                'winner_key': game.winner.urlsafe(),
+                'loser_name': player.name
+            },
+            transactional=True
+        )
+
     @staticmethod
     def game_outcome(player_one_hand, player_two_hand):
         """Compare player hands and determine the outcome of the poker game.
 
+        Each hand is ranked by the lookup table evaluator, so the outcome is a
+        comparison of two integers.
+
         Args:
           player_one_hand: first player's hand.
           player_two_hand: second player's hand.
@@ -478,315 +663,95 @@ class Poker(object):
             Player One Wins: 1
             Player Two Wins: 2
         """
-        def sort_by_card_value(card):
-            """Sort key by Card value."""
-            return card.value
-
-        def is_ace_low(lowest_card, highest_card):
-            """Determine if Ace is used as the lowest card in a straight."""
-            return (lowest_card.value == 2 and highest_card.value == 14)
-
-        def are_cards_same_suit(hand):
-            """Check if there is a flush."""
-            is_same_suit = True
-            suit = None
-            for card in hand:
-                if (suit is None):
-                    suit = card.suit
-                elif (suit == card.suit):
-                    is_same_suit = True
-                else:
-                    is_same_suit = False
-                    break
-            return is_same_suit
-
-        def are_cards_in_consecutive_order(hand):
-            """Check if there is a straight.
-
-            Ace low rule: if the lowest card is a Two and the highest card is
-            an Ace then temporarily assign a value of 1 to the Ace because a
-            straight can be created from Ace, Two, Three, Four, Five.
-            """
-            is_consecutive_order = True
-            sorted_hand = sorted(hand, key=sort_by_card_value)
-            index = 0
-            lowest_card = sorted_hand[0]
-            highest_card = sorted_hand[-1]
-            is_ace_low_rule = is_ace_low(lowest_card, highest_card)
-            if (is_ace_low_rule):
-                highest_card.value = 1
-                sorted_hand = sorted(hand, key=sort_by_card_value)
-                lowest_card = sorted_hand[0]
-
-            for card in sorted_hand:
-                is_consecutive_order = (
-                    (card.value - lowest_card.value) == index
-                )
-                if (not is_consecutive_order):
-                    break
-                index += 1
-
-            # Set back the original value of the Ace card
-
-            if is_ace_low_rule:
-                lowest_card.value = 14
-
-            return is_consecutive_order
-
-        def determine_hand_type(hand):
-            """Determine the type of a player's hand.
-
-            Number left of the hyphen is the score of the hand.
-
-            Poker hand rankings:
-              10 - Royal Flush
-              9 - Straight Flush
-              8 - Four of a Kind
-              7 - Full House
-              6 - Flush
-              5 - Straight
-              4 - Three of a Kind
-              3 - Two Pair
-              2 - Pair
-              1 - High Card
-
-            Args:
-              hand: the collection of five cards to score.
-
-            Returns:
-              A number representing the value of the hand (higher is better).
-            """
-            sorted_hand = sorted(hand, key=sort_by_card_value)
-
-            # Check card frequencies to determine groupings (pairs, triple,
-            # etc).
-
-            card_frequencies = Counter([card.value for card in sorted_hand])
-            has_four_of_kind = False
-            has_three_of_kind = False
-            has_two_pairs = False
-            has_pair = False
-            for card_frequency in card_frequencies.most_common():
-                card_value = card_frequency[0]
-                card_count = card_frequency[1]
-                if (card_count == 4):
-                    has_four_of_kind = True
-                elif (card_count == 3):
-                    has_three_of_kind = True
-                elif (card_count == 2):
-                    if (has_pair):
-                        has_two_pairs = True
-                    else:
-                        has_pair = True
-
-            is_flush = are_cards_same_suit(sorted_hand)
-            is_straight = are_cards_in_consecutive_order(sorted_hand)
-
-            if (is_flush and is_straight):
-                lowest_card = sorted_hand[0]
-                highest_card = sorted_hand[-1]
-                is_ace_low_rule = is_ace_low(lowest_card, highest_card)
-
-                # If highest card is an Ace then it's a Royal Flush, otherwise
-                # it's a straight flush.
-
-                if (highest_card.value == 14 and not is_ace_low_rule):
-                    return 10  # Royal Flush
-                else:
-                    return 9  # Straight Flush
-            elif (has_four_of_kind):
-                return 8  # Four of a Kind
-            elif (has_three_of_kind and has_pair):
-                return 7  # Full House
-            elif (is_flush):
-                return 6  # Flush
-            elif (is_straight):
-                return 5  # Straight
-            elif (has_three_of_kind):
-                return 4  # Three of a Kind
-            elif (has_two_pairs):
-                return 3  # Two Pairs
-            elif (has_pair):
-                return 2  # Pair
-            else:
-                return 1  # High Card
-
-        def determine_higher_hand_value(
-                player_one_hand, player_two_hand, hand_type):
-            """Determine higher hand value of hands with same hand score.
-
-            If both the player have the same hand type (score), whoever has the
-            higher hand value wins.
-
-            Args:
-              player_one_hand: player one's hand.
-              player_two_hand: player two's hand.
-              hand_type: the type of hand both players are holding.
-
-            Returns:
-              A number representing the player with higher hand value:
-                Tie: 0.
-                Player one has higher value: 1.
-                Player two has higher value: 2.
-            """
-            def highest_card_check(
-                    p1_highest_card_value, p2_highest_card_value):
-                """Determine tie breaker by high card value."""
-                if (p1_highest_card_value == p2_highest_card_value):
-                    return 0
-                if (p1_highest_card_value > p2_highest_card_value):
-                    return 1
-                else:
-                    return 2
-
-            def most_common_card_check(
-                    p1_most_common_card_value, p2_most_common_card_value):
-                """Determine tie breaker by most common card value."""
-                if (p1_most_common_card_value > p2_most_common_card_value):
-                    return 1
-                else:
-                    return 2
-
-            p1_card_counter = Counter(
-                [card.value for card in player_one_hand]
-            )
-            p1_card_frequencies = p1_card_counter.most_common()
-            p1_sorted_hand = sorted(player_one_hand, key=sort_by_card_value)
-            p1_lowest_card = p1_sorted_hand[0]
-            p1_highest_card = p1_sorted_hand[-1]
-
-            p2_card_counter = Counter(
-                [card.value for card in player_two_hand]
-            )
-            p2_card_frequencies = p2_card_counter.most_common()
-            p2_sorted_hand = sorted(player_two_hand, key=sort_by_card_value)
-            p2_lowest_card = p2_sorted_hand[0]
-            p2_highest_card = p2_sorted_hand[-1]
-
-            # Straight Flush, Flush, Straight, High Card
-            if (hand_type in [9, 6, 5, 1]):
-                if (hand_type in [9, 5]):
-                    is_p1_ace_low = is_ace_low(p1_lowest_card, p1_highest_card)
-                    if (is_p1_ace_low):
-                        p1_highest_card.value = 1
-                        p1_sorted_hand = sorted(
-                            p1_sorted_hand, key=sort_by_card_value
-                        )
-                        p1_highest_card = p1_sorted_hand[-1]
-
-                    is_p2_ace_low = is_ace_low(p2_lowest_card, p2_highest_card)
-                    if (is_p2_ace_low):
-                        p2_highest_card.value = 1
-                        p2_sorted_hand = sorted(
-                            p2_sorted_hand, key=sort_by_card_value
-                        )
-                        p2_highest_card = p2_sorted_hand[-1]
-
-                return highest_card_check(
-                    p1_highest_card.value, p2_highest_card.value)
-            # Four of a Kind, Full House, Three of a Kind
-            elif (hand_type in [8, 7, 4]):
-                return most_common_card_check(
-                    p1_card_frequencies[0][0], p2_card_frequencies[0][0])
-            # Two Pairs
-            elif (hand_type == 3):
-                def sort_freq(card):
-                    """Use card value in card frequency tuple to sort."""
-                    return card[0]
-
-                p1_card_frequencies = p1_card_counter.most_common(2)
-                p1_card_frequencies = sorted(
-                    p1_card_frequencies, key=sort_freq)
-                p1_high_pair = p1_card_frequencies[1]
-                p1_low_pair = p1_card_frequencies[0]
-                p2_card_frequencies = p2_card_counter.most_common(2)
-                p2_card_frequencies = sorted(
-                    p2_card_frequencies, key=sort_freq)
-                p2_high_pair = p2_card_frequencies[1]
-                p2_low_pair = p2_card_frequencies[0]
-
-                if (p1_high_pair[0] == p2_high_pair[0]):
-                    if (p1_low_pair[0] == p2_low_pair[0]):
-                        return 0
-                    elif (p1_low_pair[0] > p2_low_pair[0]):
-                        return 1
-                    else:
-                        return 2
-                elif (p1_high_pair[0] > p2_high_pair[0]):
-                    return 1
-                else:
-                    return 2
-            # Pair
-            elif (hand_type == 2):
-                p1_pair = p1_card_frequencies[0]
-                p2_pair = p2_card_frequencies[0]
-
-                p1_single_cards = [c[0] for c in p1_card_frequencies[1:]]
-                p1_single_cards = sorted(p1_single_cards)
-                p1_highest_card_value = p1_single_cards[-1]
-                p2_single_cards = [c[0] for c in p2_card_frequencies[1:]]
-                p2_single_cards = sorted(p2_single_cards)
-                p2_highest_card_value = p2_single_cards[-1]
-
-                if (p1_pair[0] == p2_pair[0]):
-                    if (p1_highest_card_value == p2_highest_card_value):
-                        return 0
-                    elif (p1_highest_card_value > p2_highest_card_value):
-                        return 1
-                    else:
-                        return 2
-                elif (p1_pair[0] > p2_pair[0]):
-                    return 1
-                else:
-                    return 2
-            # Royal Flush
-            else:
-                return 0
-
-        p1_hand_type = determine_hand_type(player_one_hand)
-        p2_hand_type = determine_hand_type(player_two_hand)
+        p1_hand_rank = evaluator.evaluate(
+            [card.code for card in player_one_hand]
+        )
+        p2_hand_rank = evaluator.evaluate(
+            [card.code for card in player_two_hand]
+        )
 
-        if (p1_hand_type > p2_hand_type):
+        if (p1_hand_rank > p2_hand_rank):
             return 1
-        if (p1_hand_type < p2_hand_type):
+        if (p1_hand_rank < p2_hand_rank):
             return 2
         else:
-            return determine_higher_hand_value(
-                player_one_hand, player_two_hand, p1_hand_type)
+            return 0
+
+    @staticmethod
+    def score_hands_batch(hands):
+        """Score many hands at once; used by nightly re-scoring jobs.
+
+        Ranks use the same hand types as determine_hand_type and compare the
+        same way game_outcome does (higher is better, equal is a tie).
+
+        Args:
+          hands: an (N, 5) integer array of card codes (see Card.code).
+
+        Returns:
+          An N-length NumPy array of hand ranks.
+        """
+        return evaluator.evaluate_batch(hands)
+
+    @staticmethod
+    def determine_hand_type(hand):
+        """Determine the type of a player's hand.
+
+        Poker hand rankings:
+          10 - Royal Flush
+          9 - Straight Flush
+          8 - Four of a Kind
+          7 - Full House
+          6 - Flush
+          5 - Straight
+          4 - Three of a Kind
+          3 - Two Pair
+          2 - Pair
+          1 - High Card
+
+        Args:
+          hand: the collection of five cards to score.
+
+        Returns:
+          A number representing the value of the hand (higher is better).
+        """
+        return evaluator.hand_type(
+            evaluator.evaluate([card.code for card in hand])
+        )
 
     @staticmethod
     def update_player_stats(game):
         """Update player statistics (win, loss, tie).
 
+        Called in the transaction that ends the game, so the result is
+        recorded if and only if the game ends.
+
         Args:
           game: current game the player is playing in.
         """
-        player_one = game.player_one.get()
-        player_two = game.player_two.get()
-        if (game.winner is None):
-            player_one.ties += 1
-            player_two.ties += 1
-        elif (game.winner == game.player_one):
-            player_one.wins += 1
-            player_two.losses += 1
-        else:
-            player_one.losses += 1
-            player_two.wins += 1
-        player_one.put()
-        player_two.put()
+        stats.record_game_result(game)
 
     @staticmethod
-    def get_player_start_end_hands(hands):
-        """Return start and end hands for player.
+    def get_game_hand(game, hands, player_key, state):
+        """Return one of a player's hands.
+
+        Args:
+          game: the game the hand was delt in.
+          hands: dictionary of hand id to Hand from get_game_hands.
+          player_key: Key representing the player.
+          state: the HandState name of the hand.
 
         Returns:
-          Tuple with the starting hand as the first element and the ending hand
-          as the second element.
+          The Hand.
+
+        Raises:
+          NotFoundException: The game has no such hand.
         """
-        for hand in hands:
-            cards = Poker.load_player_hand(hand.hand)
-            if hand.state == HandState.STARTING.name:
-                start_hand = cards
-            else:
-                end_hand = cards
-        return (start_hand, end_hand)
+        hand = hands.get(Hand.get_id(game, player_key, state))
+        if hand is None:
+            raise endpoints.NotFoundException(
+                'Hand not found for player key {0} and game key {1}'.format(
+                    player_key, game.key
+                )
+            )
+        return hand
+
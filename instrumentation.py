@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from collections import deque
+from contextlib import contextmanager
+import json
+import logging
+import threading
+import time
+
+try:
+    from google.appengine.api import apiproxy_stub_map
+except ImportError:
+    apiproxy_stub_map = None
+
+# Counters kept for every request, in the order they are reported.
+
+COUNTERS = (
+    'datastore_gets',
+    'datastore_puts',
+    'datastore_queries',
+    'task_adds',
+    'memcache_calls',
+    'cache_hits',
+    'cache_misses'
+)
+
+# Timers kept for every request, in seconds.
+
+TIMERS = ('evaluator',)
+
+# Wall times of at most this many recent requests per route are kept for
+# percentiles.
+
+RECENT_REQUESTS = 1000
+
+_RPC_COUNTERS = {
+    ('datastore_v3', 'Get'): 'datastore_gets',
+    ('datastore_v3', 'Put'): 'datastore_puts',
+    ('datastore_v3', 'RunQuery'): 'datastore_queries',
+    ('taskqueue', 'Add'): 'task_adds',
+    ('taskqueue', 'BulkAdd'): 'task_adds'
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_routes = {}
+
+
+class _RequestStats(object):
+    """Counters and timers of the request being handled."""
+    def __init__(self):
+        self.counters = dict((counter, 0) for counter in COUNTERS)
+        self.timers = dict((timer, 0.0) for timer in TIMERS)
+
+
+class _RouteStats(object):
+    """Totals and recent wall times of all requests to one route."""
+    def __init__(self):
+        self.requests = 0
+        self.counters = dict((counter, 0) for counter in COUNTERS)
+        self.timers = dict((timer, 0.0) for timer in TIMERS)
+        self.wall_times = deque(maxlen=RECENT_REQUESTS)
+
+
+def count(counter, amount=1):
+    """Adds to a counter of the current request, if one is being handled."""
+    request_stats = getattr(_local, 'request_stats', None)
+    if request_stats is not None:
+        request_stats.counters[counter] += amount
+
+
+@contextmanager
+def timer(name):
+    """Adds the time spent in a with block to a timer of the request."""
+    started = time.time()
+    try:
+        yield
+    finally:
+        request_stats = getattr(_local, 'request_stats', None)
+        if request_stats is not None:
+            request_stats.timers[name] += time.time() - started
+
+
+def _count_rpc(service, call, request, response):
+    """Post-call hook counting the RPCs made by the current request."""
+    if service == 'memcache':
+        count('memcache_calls')
+        return
+    counter = _RPC_COUNTERS.get((service, call))
+    if counter == 'task_adds' and call == 'BulkAdd':
+        count(counter, request.add_request_size())
+    elif counter is not None:
+        count(counter)
+
+
+if apiproxy_stub_map is not None:
+    apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+        'instrumentation', _count_rpc
+    )
+
+
+class InstrumentRequests(object):
+    """WSGI middleware recording the cost of every request.
+
+    Each request is logged as one JSON line and added to the totals of its
+    route (its path) reported by get_route_stats.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        request_stats = _local.request_stats = _RequestStats()
+        status = []
+
+        def record_status(response_status, headers, exc_info=None):
+            status.append(response_status)
+            return start_response(response_status, headers, exc_info)
+
+        started = time.time()
+        try:
+            return self.app(environ, record_status)
+        finally:
+            wall_time = time.time() - started
+            _local.request_stats = None
+            _record(
+                environ.get('PATH_INFO', ''),
+                status[0] if status else None,
+                wall_time,
+                request_stats
+            )
+
+
+def _record(route, status, wall_time, request_stats):
+    """Logs a finished request and adds it to its route's totals."""
+    logging.info('request_stats %s', json.dumps(dict(
+        route=route,
+        status=status,
+        wall_ms=round(wall_time * 1000, 3),
+        timers_ms=dict(
+            (name, round(seconds * 1000, 3))
+            for name, seconds in request_stats.timers.items()
+        ),
+        **request_stats.counters
+    ), sort_keys=True))
+
+    with _lock:
+        route_stats = _routes.get(route)
+        if route_stats is None:
+            route_stats = _routes[route] = _RouteStats()
+        route_stats.requests += 1
+        route_stats.wall_times.append(wall_time)
+        for counter, value in request_stats.counters.items():
+            route_stats.counters[counter] += value
+        for name, seconds in request_stats.timers.items():
+            route_stats.timers[name] += seconds
+
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile of sorted values, or 0.0."""
+    if not values:
+        return 0.0
+    index = int(round(fraction * len(values))) - 1
+    return values[max(0, min(len(values) - 1, index))]
+
+
+def get_route_stats():
+    """Returns the request totals of this instance since it started.
+
+    Returns:
+      A list of dictionaries, one per route sorted by route, with the route,
+      number of requests, p50, p90 and p99 wall milliseconds over the most
+      recent requests, and the mean of every counter and timer per request.
+    """
+    with _lock:
+        routes = [
+            (route, route_stats.requests, sorted(route_stats.wall_times),
+             dict(route_stats.counters), dict(route_stats.timers))
+            for route, route_stats in sorted(_routes.items())
+        ]
+
+    report = []
+    for route, requests, wall_times, counters, timers in routes:
+        route_report = {
+            'route': route,
+            'requests': requests,
+            'wall_ms_p50': percentile(wall_times, 0.5) * 1000,
+            'wall_ms_p90': percentile(wall_times, 0.9) * 1000,
+            'wall_ms_p99': percentile(wall_times, 0.99) * 1000
+        }
+        for counter, total in counters.items():
+            route_report[counter] = float(total) / requests
+        for name, seconds in timers.items():
+            route_report[name + '_ms'] = seconds * 1000 / requests
+        report.append(route_report)
+    return report
+
+
+def reset_route_stats():
+    """Forgets the request totals of every route."""
+    with _lock:
+        _routes.clear()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from collections import Counter
+import random
+
+from google.appengine.ext import ndb
+
+import cache
+from model import LeaderboardShard
+from storage import get_storage
+
+NUMBER_OF_SHARDS = 20
+
+
+def _get_shard_keys():
+    """Returns the keys of every leaderboard shard."""
+    return [
+        ndb.Key(LeaderboardShard, shard_number)
+        for shard_number in range(1, NUMBER_OF_SHARDS + 1)
+    ]
+
+
+def record_points_changes(changes):
+    """Move players between points buckets after their points changed.
+
+    Changes are written to one random shard so games finishing at the same
+    time rarely write the same entity. Players with no points are not counted
+    because they never rank above anyone.
+
+    Args:
+      changes: a list of (old points, new points), one per player.
+    """
+    deltas = Counter()
+    for old_points, new_points in changes:
+        if old_points == new_points:
+            continue
+        if old_points:
+            deltas[old_points] -= 1
+        if new_points:
+            deltas[new_points] += 1
+    if not deltas:
+        return
+
+    shard_key = random.choice(_get_shard_keys())
+    get_storage().transaction(_apply_deltas, shard_key, deltas)
+
+
+def _apply_deltas(shard_key, deltas):
+    """Adds player count deltas to the points buckets of one shard."""
+    shard = get_storage().get(shard_key)
+    if shard is None:
+        shard = LeaderboardShard(key=shard_key)
+    point_counts = dict(shard.point_counts or {})
+    for points, delta in deltas.items():
+        count = point_counts.get(str(points), 0) + delta
+        if count:
+            point_counts[str(points)] = count
+        else:
+            point_counts.pop(str(points), None)
+    shard.point_counts = point_counts
+    get_storage().put(shard)
+
+
+def get_rank(points):
+    """Returns the rank of a player with the given points.
+
+    The rank is one more than the number of players with more points, so
+    players with the same points share a rank. Costs one batch get of the
+    shards no matter how many players there are.
+    """
+    players_ahead = 0
+    for shard in get_storage().get_multi(_get_shard_keys()):
+        if shard is None:
+            continue
+        for shard_points, count in shard.point_counts.items():
+            if int(shard_points) > points:
+                players_ahead += count
+    return players_ahead + 1
+
+
+def add_players(user_keys):
+    """Count players whose points are not on the leaderboard yet.
+
+    Players who earned points before the leaderboard existed are added by
+    the RebuildLeaderboard task, one batch at a time. A player is added at
+    most once, whether by this or by their next stats sync, so points
+    changes recorded while the task runs are kept.
+
+    Args:
+      user_keys: keys of the Users to add; with the leaderboard shard they
+        must fit in one cross-group transaction.
+    """
+    get_storage().transaction(_add_players, user_keys)
+
+
+def _add_players(user_keys):
+    users = [
+        user for user in get_storage().get_multi(user_keys)
+        if user is not None and not user.on_leaderboard
+    ]
+    if not users:
+        return
+    for user in users:
+        user.on_leaderboard = True
+    get_storage().put_multi(users)
+    record_points_changes([(0, user.points) for user in users])
+    cache.invalidate_users(users)
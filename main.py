@@ -3,22 +3,40 @@
 Copyright 2016 Brian Quach
 Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
 """
+import hashlib
+import time
+
 import endpoints
-import json
 import webapp2
 
 from google.appengine.api import app_identity
 from google.appengine.api import mail
 from google.appengine.ext import ndb
 
+import instrumentation
+import leaderboard
+import notifications
+import profiling
+import stats
 from api import FiveCardPokerAPI
 from enum import HandState
-from game import Card
+from game import Poker
+from model import Backfill
 from model import Game
 from model import Hand
 from model import User
+from model import UserName
+from storage import get_storage
 from utility import get_by_urlsafe
 
+REMINDER_BATCH_SIZE = 500
+BACKFILL_BATCH_SIZE = 500
+
+# The Users of a batch and one leaderboard shard are written in one
+# cross-group transaction, which can span at most 25 entity groups.
+
+LEADERBOARD_BATCH_SIZE = 24
+
 
 class SendMoveEmail(webapp2.RequestHandler):
     def post(self):
@@ -26,13 +44,9 @@ class SendMoveEmail(webapp2.RequestHandler):
         user = get_by_urlsafe(self.request.get('user_key'), User)
         game = get_by_urlsafe(self.request.get('game_key'), Game)
 
-        player_hand = Hand.query(
-            ndb.AND(
-                Hand.player == user.key,
-                Hand.game == game.key,
-                Hand.state == HandState.STARTING.name
-            )
-        ).get()
+        player_hand = get_storage().get_game_hands(game).get(
+            Hand.get_id(game, user.key, HandState.STARTING.name)
+        )
 
         if not player_hand:
             raise endpoints.NotFoundException(
@@ -41,8 +55,7 @@ class SendMoveEmail(webapp2.RequestHandler):
                 )
             )
 
-        hand = json.loads(player_hand.hand)
-        cards = [Card(name=card['name'], suit=card['suit']) for card in hand]
+        cards = Poker.load_player_hand(player_hand.hand)
         hand_information = ''
         for card in cards:
             hand_information += 'Card: {0}\nCard Id: {1}\n\n'.format(
@@ -70,7 +83,6 @@ identify to the server which cards you want to exchange when you make your next
 move to the server.
         '''.format(user.name, hand_information, game.key.urlsafe())
 
-        print body
         mail.send_mail(
             'noreply@{}.appspotmail.com'.format(
                 app_identity.get_application_id()
@@ -86,13 +98,10 @@ class SendGameResultEmail(webapp2.RequestHandler):
         """Send an email to the players to notify them the game results."""
         game = get_by_urlsafe(self.request.get('game_key'), Game)
 
-        player_one_hand = Hand.query(
-            ndb.AND(
-                Hand.player == game.player_one,
-                Hand.game == game.key,
-                Hand.state == HandState.ENDING.name
-            )
-        ).get()
+        hands = get_storage().get_game_hands(game)
+        player_one_hand = hands.get(
+            Hand.get_id(game, game.player_one, HandState.ENDING.name)
+        )
         if not player_one_hand:
             raise endpoints.NotFoundException(
                 'Hand not found for player key {0} and game key {1}'.format(
@@ -100,13 +109,9 @@ class SendGameResultEmail(webapp2.RequestHandler):
                 )
             )
 
-        player_two_hand = Hand.query(
-            ndb.AND(
-                Hand.player == game.player_two,
-                Hand.game == game.key,
-                Hand.state == HandState.ENDING.name
-            )
-        ).get()
+        player_two_hand = hands.get(
+            Hand.get_id(game, game.player_two, HandState.ENDING.name)
+        )
         if not player_two_hand:
             raise endpoints.NotFoundException(
                 'Hand not found for player key {0} and game key {1}'.format(
@@ -115,15 +120,13 @@ class SendGameResultEmail(webapp2.RequestHandler):
             )
 
         player_one = game.player_one.get()
-        hand = json.loads(player_one_hand.hand)
-        cards = [Card(name=card['name'], suit=card['suit']) for card in hand]
+        cards = Poker.load_player_hand(player_one_hand.hand)
         p1_hand_information = ''
         for card in cards:
             p1_hand_information += 'Card: {0}\n'.format(repr(card))
 
         player_two = game.player_two.get()
-        hand = json.loads(player_two_hand.hand)
-        cards = [Card(name=card['name'], suit=card['suit']) for card in hand]
+        cards = Poker.load_player_hand(player_two_hand.hand)
         p2_hand_information = ''
         for card in cards:
             p2_hand_information += 'Card: {0}\n'.format(repr(card))
@@ -150,7 +153,6 @@ Game finished! {0}
             p2_hand_information
         )
 
-        print body
         mail.send_mail(
             'noreply@{}.appspotmail.com'.format(
                 app_identity.get_application_id()
@@ -187,7 +189,6 @@ Your opponent {0} for game {1} has forfeited. You are the winner!
             winner.name
         )
 
-        print body
         mail.send_mail(
             'noreply@{}.appspotmail.com'.format(
                 app_identity.get_application_id()
@@ -198,44 +199,209 @@ Your opponent {0} for game {1} has forfeited. You are the winner!
         )
 
 
+class SyncPlayerStats(webapp2.RequestHandler):
+    def post(self):
+        """Copy a player's sharded stats to their User."""
+        stats.sync_user(ndb.Key(urlsafe=self.request.get('user_key')))
+
+
 class SendReminderEmail(webapp2.RequestHandler):
     def get(self):
-        """Send a reminder email to users with a game in progress."""
-        players = User.query(User.email != None)  # noqa
-        for player in players:
-            games = Game.query(
-                ndb.AND(
-                    Game.game_over == False,  # noqa
-                    Game.active_player == player.key
+        """Start sending reminder emails to users with a game in progress."""
+        notifications.add(
+            url='/tasks/send_reminder_emails',
+            params={'run': int(time.time())}
+        )
+
+
+class SendReminderEmails(webapp2.RequestHandler):
+    def post(self):
+        """Queue reminder emails for one batch of players with a move to make.
+
+        The active players of games in progress are scanned once, each
+        player once, one batch per task; each task queues the next one with
+        the query cursor. The next task is named after the run and cursor so
+        a retried task does not start a second chain.
+
+        Each player is emailed by their own task, named after the run and
+        player, so a slow mail API does not hold up the chain and a retried
+        batch does not email a player twice.
+        """
+        query = Game.query(
+            Game.game_over == False,  # noqa
+            projection=[Game.active_player],
+            distinct=True
+        ).order(Game.active_player)
+        urlsafe_cursor = self.request.get('cursor')
+        games, next_cursor, more = query.fetch_page(
+            REMINDER_BATCH_SIZE,
+            start_cursor=(
+                ndb.Cursor(urlsafe=urlsafe_cursor) if urlsafe_cursor else None
+            )
+        )
+
+        run = self.request.get('run')
+        if more and next_cursor:
+            cursor = next_cursor.urlsafe()
+            notifications.add(
+                url='/tasks/send_reminder_emails',
+                params={'run': run, 'cursor': cursor},
+                name='send-reminder-emails-{0}-{1}'.format(
+                    run, hashlib.sha1(cursor).hexdigest()
+                )
+            )
+
+        for game in games:
+            notifications.add(
+                url='/tasks/send_player_reminder_email',
+                params={'user_key': game.active_player.urlsafe()},
+                name='send-player-reminder-email-{0}-{1}'.format(
+                    run, game.active_player.id()
                 )
             )
-            game_keys = ', '.join(game.key.urlsafe() for game in games)
-            number_of_games = games.count()
-            if number_of_games > 0:
-                subject = 'This is a reminder!'
-                body = '''Hey {0}, you have {1} games in progress. It is your
+
+
+class SendPlayerReminderEmail(webapp2.RequestHandler):
+    def post(self):
+        """Email a player the games in which it is their turn."""
+        player = get_by_urlsafe(self.request.get('user_key'), User)
+        if player is None or not player.email:
+            return
+        game_keys = [
+            game_key.urlsafe() for game_key in Game.query(
+                Game.game_over == False,  # noqa
+                Game.active_player == player.key
+            ).fetch(keys_only=True)
+        ]
+        if not game_keys:
+            return
+
+        subject = 'This is a reminder!'
+        body = '''Hey {0}, you have {1} games in progress. It is your
  turn to make a move in these games! Their url safe keys are: {2}'''.format(
-                    player.name,
-                    number_of_games,
-                    game_keys
+            player.name,
+            len(game_keys),
+            ', '.join(game_keys)
+        )
+
+        mail.send_mail(
+            'noreply@{}.appspotmail.com'.format(
+                app_identity.get_application_id()
+            ),
+            player.email,
+            subject,
+            body
+        )
+
+
+class BackfillUserNames(webapp2.RequestHandler):
+    def get(self):
+        """Start reserving the names of Users created before UserName.
+
+        Run once, by an admin, after deploying UserName. Until it finishes,
+        players are also looked up and sign-up names checked with a name
+        query (see storage.NdbStorage).
+        """
+        notifications.add(
+            url='/tasks/backfill_user_names',
+            params={'run': int(time.time())}
+        )
+
+    def post(self):
+        """Reserve the names of one batch of Users.
+
+        Each task queues the next one with the query cursor, named after the
+        run and cursor like SendReminderEmails. A name that is already
+        reserved keeps its UserName. The last task marks the backfill as
+        finished, which ends the name queries.
+        """
+        urlsafe_cursor = self.request.get('cursor')
+        users, next_cursor, more = User.query().fetch_page(
+            BACKFILL_BATCH_SIZE,
+            start_cursor=(
+                ndb.Cursor(urlsafe=urlsafe_cursor) if urlsafe_cursor else None
+            )
+        )
+
+        if more and next_cursor:
+            run = self.request.get('run')
+            cursor = next_cursor.urlsafe()
+            notifications.add(
+                url='/tasks/backfill_user_names',
+                params={'run': run, 'cursor': cursor},
+                name='backfill-user-names-{0}-{1}'.format(
+                    run, hashlib.sha1(cursor).hexdigest()
                 )
+            )
+
+        futures = [
+            UserName.get_or_insert_async(user.name, user=user.key)
+            for user in users
+        ]
+        for future in futures:
+            future.get_result()
+
+        if not more:
+            get_storage().put(
+                Backfill(key=Backfill.get_key(Backfill.USER_NAMES))
+            )
+
+
+class RebuildLeaderboard(webapp2.RequestHandler):
+    def get(self):
+        """Start counting players who earned points before the leaderboard.
+
+        Run once, by an admin, after deploying the leaderboard; until it
+        finishes players who have not played since are missing from ranks.
+        """
+        notifications.add(
+            url='/tasks/rebuild_leaderboard',
+            params={'run': int(time.time())}
+        )
 
-                print body
-                mail.send_mail(
-                    'noreply@{}.appspotmail.com'.format(
-                        app_identity.get_application_id()
-                    ),
-                    player.email,
-                    subject,
-                    body
+    def post(self):
+        """Add one batch of players with points to the leaderboard.
+
+        Each task queues the next one with the query cursor, named after the
+        run and cursor like SendReminderEmails.
+        """
+        urlsafe_cursor = self.request.get('cursor')
+        user_keys, next_cursor, more = User.query(User.points > 0).fetch_page(
+            LEADERBOARD_BATCH_SIZE,
+            start_cursor=(
+                ndb.Cursor(urlsafe=urlsafe_cursor) if urlsafe_cursor else None
+            ),
+            keys_only=True
+        )
+
+        if more and next_cursor:
+            run = self.request.get('run')
+            cursor = next_cursor.urlsafe()
+            notifications.add(
+                url='/tasks/rebuild_leaderboard',
+                params={'run': run, 'cursor': cursor},
+                name='rebuild-leaderboard-{0}-{1}'.format(
+                    run, hashlib.sha1(cursor).hexdigest()
                 )
+            )
 
-app = webapp2.WSGIApplication(
-    [
-        ('/tasks/send_move_email', SendMoveEmail),
-        ('/tasks/send_game_result_email', SendGameResultEmail),
-        ('/tasks/send_player_forfeit_email', SendPlayerForfeitEmail),
-        ('/crons/send_reminder', SendReminderEmail)
-    ],
-    debug=True
-)
+        if user_keys:
+            leaderboard.add_players(user_keys)
+
+
+app = instrumentation.InstrumentRequests(profiling.ProfileRequests(
+    notifications.FlushNotifications(webapp2.WSGIApplication(
+        [
+            ('/tasks/send_move_email', SendMoveEmail),
+            ('/tasks/send_game_result_email', SendGameResultEmail),
+            ('/tasks/send_player_forfeit_email', SendPlayerForfeitEmail),
+            ('/tasks/sync_player_stats', SyncPlayerStats),
+            ('/tasks/send_reminder_emails', SendReminderEmails),
+            ('/tasks/send_player_reminder_email', SendPlayerReminderEmail),
+            ('/tasks/backfill_user_names', BackfillUserNames),
+            ('/tasks/rebuild_leaderboard', RebuildLeaderboard),
+            ('/crons/send_reminder', SendReminderEmail)
+        ],
+        debug=True
+    ))
+))
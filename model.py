@@ -3,12 +3,39 @@
 Copyright 2016 Brian Quach
 Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
 """
+import json
+
 from google.appengine.ext import ndb
 
+import evaluator
 from form import GameForm
 from form import UserForm
 
 
+class CardsProperty(ndb.BlobProperty):
+    """Stores a list of cards as a byte string with one card code per byte.
+
+    Entities written before this property existed hold their cards as JSON;
+    those values are converted to bytes when read and saved as bytes the next
+    time the entity is put.
+    """
+    def _from_base_type(self, value):
+        """Converts legacy JSON values to card code bytes."""
+        if not self._is_legacy_json(value):
+            return None
+        cards = json.loads(value)
+        if isinstance(cards, basestring):
+            cards = json.loads(cards)
+        return bytes(bytearray(
+            evaluator.card_code(card['name'], card['suit']) for card in cards
+        ))
+
+    @staticmethod
+    def _is_legacy_json(value):
+        """Card codes are 0 to 51 so any larger byte means JSON text."""
+        return bool(value) and max(bytearray(value)) > 51
+
+
 class User(ndb.Model):
     """User profile.
 
@@ -24,6 +51,8 @@ class User(ndb.Model):
       ties: Number of games a player has tied.
       losses: Number of games a player has loss.
       points: Total points a player has earned from all games played.
+      on_leaderboard: Whether the player's points are counted by the
+        leaderboard (see leaderboard.py).
 
     Code Citation:
       https://github.com/udacity/FSND-P4-Design-A-Game/blob/master/Sample%20Project%20tic-tac-toe/models.py  # noqa
@@ -37,6 +66,7 @@ class User(ndb.Model):
         lambda self:
             (self.wins * 3) + (self.ties * 2) + (self.losses)
     )
+    on_leaderboard = ndb.BooleanProperty(default=False, indexed=False)
 
     def to_form(self):
         """Returns a form representation of the User"""
@@ -47,55 +77,214 @@ class User(ndb.Model):
         return form
 
 
+class UserName(ndb.Model):
+    """Reserves a player name; the key id is the name.
+
+    Names are unique because a User is only created in the same transaction
+    that creates its UserName, and players are found by name with key gets.
+
+    Attributes:
+      user: Key of the User with this name.
+    """
+    user = ndb.KeyProperty(kind='User', required=True)
+
+    @classmethod
+    def get_key(cls, name):
+        """Returns the key of the UserName for a player name."""
+        return ndb.Key(cls, name)
+
+
+class Backfill(ndb.Model):
+    """Marks a one-off backfill as finished; the key id names it.
+
+    Attributes:
+      finished: When the backfill finished.
+    """
+    USER_NAMES = 'user_names'
+
+    finished = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+    @classmethod
+    def get_key(cls, name):
+        """Returns the key of the Backfill with a name."""
+        return ndb.Key(cls, name)
+
+
+class PlayerStatsShard(ndb.Model):
+    """One shard of a player's wins, ties and losses.
+
+    A player's stats are the sum of their shards (see stats.py). The key id
+    is the User id and the shard number joined by a dash.
+
+    Attributes:
+      wins: Number of games won.
+      ties: Number of games tied.
+      losses: Number of games lost.
+    """
+    wins = ndb.IntegerProperty(default=0, indexed=False)
+    ties = ndb.IntegerProperty(default=0, indexed=False)
+    losses = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class LeaderboardShard(ndb.Model):
+    """One shard of the number of players with each points total.
+
+    The counts of all shards add up to the number of players with each points
+    total, which is enough to find any player's rank (see leaderboard.py).
+    A shard may hold negative counts.
+
+    Attributes:
+      point_counts: Dictionary of points (as a string) to number of players.
+    """
+    point_counts = ndb.JsonProperty(default={})
+
+
+class GameSummary(ndb.Model):
+    """The players, hands and winner of a finished game.
+
+    Written on the Game when it ends so a game history is read without
+    loading the players or hands. Forfeited games have no hands.
+
+    Attributes:
+      player_one: Name of player one.
+      player_two: Name of player two.
+      player_one_start_hand: Player one's starting hand.
+      player_one_end_hand: Player one's final hand.
+      player_two_start_hand: Player two's starting hand.
+      player_two_end_hand: Player two's final hand.
+      winner: Name of the winner; None for a tie.
+    """
+    player_one = ndb.StringProperty()
+    player_two = ndb.StringProperty()
+    player_one_start_hand = CardsProperty()
+    player_one_end_hand = CardsProperty()
+    player_two_start_hand = CardsProperty()
+    player_two_end_hand = CardsProperty()
+    winner = ndb.StringProperty()
+
+
 class Game(ndb.Model):
     """Respesents a game of five card poker.
 
     Attributes:
-      deck: List of cards representing the deck.
+      deck: Cards left in the deck, stored one byte per card. Only used by
+        games created before decks were seeded.
+      deck_seed: Random bytes the deck order is derived from (see Deck).
+      deck_position: Number of cards drawn from the seeded deck.
       player_one: Key representing player one in the game.
       player_two: Key representing player two in the game.
       active_player: Key representing current player's turn.
       game_over: Boolean if game is completed or not.
       is_forfeit: Boolean if game is forfeited or not.
       winner: Key representing player who has won the game.
+      summary: GameSummary written when the game ends.
 
     Code Citation:
       https://github.com/udacity/FSND-P4-Design-A-Game/blob/master/Sample%20Project%20tic-tac-toe/models.py  # noqa
     """
-    deck = ndb.JsonProperty(required=True)
+    deck = CardsProperty()
+    deck_seed = ndb.BlobProperty()
+    deck_position = ndb.IntegerProperty(default=0, indexed=False)
     player_one = ndb.KeyProperty(required=True, kind='User')
     player_two = ndb.KeyProperty(required=True, kind='User')
     active_player = ndb.KeyProperty()
     game_over = ndb.BooleanProperty(required=True, default=False)
     is_forfeit = ndb.BooleanProperty(required=True, default=False)
     winner = ndb.KeyProperty()
+    summary = ndb.LocalStructuredProperty(GameSummary)
 
     def to_form(self):
         """Returns a form representation of the Game."""
+        return Game.to_forms([self])[0]
+
+    @staticmethod
+    def to_forms(games, names=None):
+        """Returns form representations of games.
+
+        The players of every game are loaded together in one batch get
+        instead of one get per player per game.
+
+        Args:
+          games: the Games.
+          names: optional dictionary of User key to name of players the
+            caller already has; only the other players are loaded.
+        """
+        names = dict(names or {})
+        user_keys = set()
+        for game in games:
+            user_keys.update(
+                key for key in (
+                    game.player_one,
+                    game.player_two,
+                    game.active_player,
+                    game.winner
+                )
+                if key is not None and key not in names
+            )
+        if user_keys:
+            names.update(
+                (user.key, user.name)
+                for user in ndb.get_multi(list(user_keys)) if user is not None
+            )
+        return [game._to_form(names) for game in games]
+
+    def _to_form(self, names):
+        """Returns a form representation of the Game.
+
+        Args:
+          names: dictionary of User key to name holding the game's players.
+        """
         form = GameForm(
-            player_one=self.player_one.get().name,
-            player_two=self.player_two.get().name,
-            active_player=self.active_player.get().name,
+            player_one=names.get(self.player_one),
+            player_two=names.get(self.player_two),
+            active_player=names.get(self.active_player),
             game_over=self.game_over,
             is_forfeit=self.is_forfeit,
             urlsafe_key=self.key.urlsafe()
         )
         if self.winner:
-            form.winner = self.winner.get().name
+            form.winner = names.get(self.winner)
         return form
 
 
 class Hand(ndb.Model):
     """Represents a player's hand in a poker game.
 
+    Hands are children of their Game, keyed by player and state: p1_start,
+    p1_end, p2_start and p2_end. All hands of a game can be fetched in one
+    batch get.
+
     Attributes:
       player: Key representing the player of the hand.
       game: Key representing the game from where the player had their hand
         delt.
-      hand: A list representing the cards in the player's hand.
+      hand: The cards in the player's hand, stored one byte per card.
       state: Enum representing the current hand state in the game.
     """
     player = ndb.KeyProperty(required=True, kind='User')
     game = ndb.KeyProperty(required=True, kind='Game')
-    hand = ndb.JsonProperty(required=True)
+    hand = CardsProperty(required=True)
     state = ndb.StringProperty(required=True, default='STARTING')
+
+    _STATE_IDS = {'STARTING': 'start', 'ENDING': 'end'}
+
+    @classmethod
+    def get_id(cls, game, player_key, state):
+        """Returns the id of a player's hand in a game, e.g. p1_start.
+
+        Args:
+          game: the game the hand was delt in.
+          player_key: Key representing the player of the hand.
+          state: the HandState name of the hand.
+        """
+        player_number = 1 if player_key == game.player_one else 2
+        return 'p{0}_{1}'.format(player_number, cls._STATE_IDS[state])
+
+    @classmethod
+    def get_ids(cls, game):
+        """Returns the ids of every hand a game can have."""
+        return [
+            cls.get_id(game, player_key, state)
+            for player_key in (game.player_one, game.player_two)
+            for state in ('STARTING', 'ENDING')
+        ]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import threading
+
+from google.appengine.api import taskqueue
+
+import storage
+
+
+class MemoryQueue(object):
+    """In-memory stand-in for taskqueue.Queue used by tests and benchmarks.
+
+    Tasks are recorded instead of run. Like a push queue, a task whose name
+    was already added is refused, and one call cannot add two tasks with the
+    same name.
+
+    Attributes:
+      tasks: list of added tasks.
+      add_calls: number of calls to add.
+    """
+    def __init__(self):
+        self.tasks = []
+        self.add_calls = 0
+        self._names = set()
+
+    def add(self, task, transactional=False):
+        self.add_calls += 1
+        tasks = task if isinstance(task, (list, tuple)) else [task]
+        names = [
+            queued_task.name for queued_task in tasks
+            if queued_task.name is not None
+        ]
+        if len(set(names)) < len(names):
+            raise taskqueue.DuplicateTaskNameError()
+        refused = False
+        for queued_task in tasks:
+            if queued_task.name is not None:
+                if queued_task.name in self._names:
+                    refused = True
+                    continue
+                self._names.add(queued_task.name)
+            self.tasks.append(queued_task)
+        if refused:
+            raise taskqueue.TaskAlreadyExistsError()
+        return task
+
+    def add_async(self, task, transactional=False):
+        try:
+            return storage.Done(self.add(task, transactional))
+        except taskqueue.TaskAlreadyExistsError as error:
+            return storage.Done(error=error)
+
+
+class NotificationDispatcher(object):
+    """Buffers push tasks and adds them to the queue in batches.
+
+    Tasks added in a transaction are added with the transaction, in one
+    batch, when it finishes (see storage.py). Other tasks wait for flush,
+    called once the request is handled (see FlushNotifications).
+    """
+    def __init__(self):
+        self._tasks = []
+        self._transactional_tasks = []
+        self._in_transaction = False
+
+    def add(self, url, params, transactional=False, name=None,
+            countdown=None):
+        """Buffers a task.
+
+        Args:
+          url: handler url of the task.
+          params: dictionary of task parameters.
+          transactional: whether the task is only added if the current
+            transaction commits.
+          name: optional task name; a named task is added at most once.
+          countdown: optional seconds to wait before running the task.
+
+        Raises:
+          BadTransactionStateError: transactional is set outside a
+            transaction.
+        """
+        if transactional and not self._in_transaction:
+            raise taskqueue.BadTransactionStateError(
+                'Transactional tasks can only be added in a transaction.'
+            )
+        task = taskqueue.Task(
+            url=url, params=params, name=name, countdown=countdown
+        )
+        if transactional:
+            self._transactional_tasks.append(task)
+        else:
+            self._tasks.append(task)
+
+    def flush(self):
+        """Adds the buffered tasks to the queue."""
+        tasks, self._tasks = self._tasks, []
+        _add_tasks(tasks, transactional=False)
+
+    def begin_transactional(self):
+        """Starts buffering the tasks of a transaction attempt."""
+        self._transactional_tasks = []
+        self._in_transaction = True
+
+    def flush_transactional(self):
+        """Adds the tasks buffered in the current transaction to the queue."""
+        tasks, self._transactional_tasks = self._transactional_tasks, []
+        self._in_transaction = False
+        _add_tasks(tasks, transactional=True)
+
+    def discard_transactional(self):
+        """Drops the tasks buffered by a transaction attempt that failed."""
+        self._transactional_tasks = []
+        self._in_transaction = False
+
+
+def _add_tasks(tasks, transactional):
+    """Adds tasks to the queue, up to MAX_TASKS_PER_ADD per call.
+
+    The calls run at the same time. Of tasks with the same name only the
+    first is added, since the queue refuses a batch naming a task twice.
+    """
+    names = set()
+    unique_tasks = []
+    for task in tasks:
+        if task.name is not None:
+            if task.name in names:
+                continue
+            names.add(task.name)
+        unique_tasks.append(task)
+    tasks = unique_tasks
+
+    queue = get_queue()
+    rpcs = [
+        queue.add_async(
+            tasks[i:i + taskqueue.MAX_TASKS_PER_ADD],
+            transactional=transactional
+        )
+        for i in range(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD)
+    ]
+    for rpc in rpcs:
+        try:
+            rpc.get_result()
+        except (taskqueue.TaskAlreadyExistsError,
+                taskqueue.TombstonedTaskError):
+            # A named task was already added; the rest of the batch is.
+
+            pass
+
+
+_queue = None
+_local = threading.local()
+
+
+def get_queue():
+    """Returns the queue tasks are added to; the default push queue."""
+    return _queue if _queue is not None else taskqueue.Queue()
+
+
+def set_queue(queue):
+    """Replaces the queue, e.g. with a MemoryQueue for benchmarks.
+
+    Returns:
+      The previous queue or None for the default push queue.
+    """
+    global _queue
+    previous_queue = _queue
+    _queue = queue
+    return previous_queue
+
+
+def get_dispatcher():
+    """Returns the NotificationDispatcher of the current request."""
+    dispatcher = getattr(_local, 'dispatcher', None)
+    if dispatcher is None:
+        dispatcher = _local.dispatcher = NotificationDispatcher()
+    return dispatcher
+
+
+def add(url, params, transactional=False, name=None, countdown=None):
+    """Buffers a task with the dispatcher of the current request."""
+    get_dispatcher().add(
+        url,
+        params,
+        transactional=transactional,
+        name=name,
+        countdown=countdown
+    )
+
+
+def flush():
+    """Adds the tasks buffered by the current request to the queue."""
+    get_dispatcher().flush()
+
+
+class FlushNotifications(object):
+    """WSGI middleware adding the tasks buffered by a request once it ends."""
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        try:
+            return self.app(environ, start_response)
+        finally:
+            flush()
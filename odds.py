@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from itertools import combinations
+from itertools import permutations
+import random
+import time
+
+from evaluator import CARD_INTS
+from evaluator import HIGH_CARD
+from evaluator import ROYAL_FLUSH
+from evaluator import evaluate_ints
+from game import Deck
+from game import Poker
+
+DEFAULT_TRIALS = 2000
+MAX_TRIALS = 20000
+DEFAULT_TIME_BUDGET = 0.05  # seconds
+EXACT_ODDS_CACHE_SIZE = 10000
+
+_SUIT_PERMUTATIONS = list(permutations(range(4)))
+_exact_odds_cache = {}
+
+
+def _get_discard_subsets(hand):
+    """Returns all 32 ways to pick cards to exchange from a five card hand."""
+    return [
+        discards
+        for number_of_discards in range(len(hand) + 1)
+        for discards in combinations(hand, number_of_discards)
+    ]
+
+
+def simulate_discard_odds(hand, trials=DEFAULT_TRIALS,
+                          time_budget=DEFAULT_TIME_BUDGET, rng=None):
+    """Estimate the chance of winning for every possible card exchange.
+
+    Each trial shuffles the unseen cards once; the first five become the
+    opponent's final hand and the next ones replace the exchanged cards. All
+    32 exchanges are scored against the same opponent hand, so one trial costs
+    one shuffle and 33 table lookups and the loop allocates no lists.
+
+    The first trial always runs, even when time_budget is already spent.
+
+    Args:
+      hand: the player's five cards.
+      trials: the most trials to run; at least one.
+      time_budget: seconds after which no more trials are started.
+      rng: optional random.Random instance, for reproducible results.
+
+    Returns:
+      A tuple of the number of trials run and a list of (discards, win
+      probability, tie probability) for each exchange, best chance first.
+
+    Raises:
+      ValueError: trials is less than one.
+    """
+    if trials < 1:
+        raise ValueError('At least one trial is required.')
+    random_number = (rng or random.Random()).random
+    held_codes = set(card.code for card in hand)
+    unseen = [
+        CARD_INTS[card.code] for card in Deck().cards
+        if card.code not in held_codes
+    ]
+    number_unseen = len(unseen)
+
+    # Slots 0-4 hold the player's cards and slots 5-9 hold the replacements
+    # drawn this trial; each exchange is the five slots it keeps or draws.
+
+    slots = [CARD_INTS[card.code] for card in hand] + [0] * 5
+    discard_subsets = _get_discard_subsets(range(5))
+    exchanges = []
+    for discards in discard_subsets:
+        kept = [i for i in range(5) if i not in discards]
+        exchanges.append(tuple(kept + range(5, 5 + len(discards))))
+    number_of_exchanges = len(exchanges)
+    wins = [0] * number_of_exchanges
+    ties = [0] * number_of_exchanges
+
+    deadline = time.time() + time_budget
+    trials_run = 0
+    while trials_run < trials:
+        if trials_run & 63 == 0 and trials_run and time.time() > deadline:
+            break
+        for i in range(10):
+            j = i + int(random_number() * (number_unseen - i))
+            unseen[i], unseen[j] = unseen[j], unseen[i]
+        opponent_rank = evaluate_ints(
+            unseen[0], unseen[1], unseen[2], unseen[3], unseen[4]
+        )
+        slots[5] = unseen[5]
+        slots[6] = unseen[6]
+        slots[7] = unseen[7]
+        slots[8] = unseen[8]
+        slots[9] = unseen[9]
+        index = 0
+        for a, b, c, d, e in exchanges:
+            rank = evaluate_ints(
+                slots[a], slots[b], slots[c], slots[d], slots[e]
+            )
+            if rank > opponent_rank:
+                wins[index] += 1
+            elif rank == opponent_rank:
+                ties[index] += 1
+            index += 1
+        trials_run += 1
+
+    odds = []
+    for index, discards in enumerate(discard_subsets):
+        odds.append((
+            [hand[i] for i in discards],
+            float(wins[index]) / trials_run,
+            float(ties[index]) / trials_run
+        ))
+    odds.sort(key=lambda exchange: exchange[1], reverse=True)
+    return trials_run, odds
+
+
+def _get_canonical_key(kept_codes, discarded_codes):
+    """Returns the same key for hands that only differ by suit names.
+
+    Renaming suits does not change which hand types can be drawn, so every
+    one of the 24 suit renamings is tried and the smallest result is the key.
+    """
+    keys = []
+    for suits in _SUIT_PERMUTATIONS:
+        keys.append((
+            tuple(sorted(code - code % 4 + suits[code % 4]
+                         for code in kept_codes)),
+            tuple(sorted(code - code % 4 + suits[code % 4]
+                         for code in discarded_codes))
+        ))
+    return min(keys)
+
+
+def exact_discard_odds(hand, card_ids):
+    """Count the hand types that can be drawn for a card exchange.
+
+    Every replacement the exchange could draw from the unseen cards is scored;
+    like Poker.get_new_cards, exchanged cards do not go back into the deck.
+    Results are cached, and hands that only differ by suit names share a
+    cache entry.
+
+    Args:
+      hand: the player's five cards.
+      card_ids: the card ids of the cards the player wants to exchange.
+
+    Returns:
+      A tuple of the number of possible draws and a dictionary of hand type
+      (see Poker.determine_hand_type) to the number of draws making it.
+
+    Raises:
+      ValueError: the player does not have a card with one of the ids.
+    """
+    discards = []
+    for card_id in card_ids:
+        card = Poker.is_card_id_valid(hand, card_id)
+        if card is None:
+            raise ValueError(
+                'Player does not have a card with ID: {0}'.format(card_id)
+            )
+        discards.append(card)
+    kept_codes = [card.code for card in hand if card not in discards]
+    discarded_codes = [card.code for card in discards]
+
+    key = _get_canonical_key(kept_codes, discarded_codes)
+    result = _exact_odds_cache.get(key)
+    if result is None:
+        result = _count_hand_types(kept_codes, discarded_codes)
+        if len(_exact_odds_cache) >= EXACT_ODDS_CACHE_SIZE:
+            _exact_odds_cache.clear()
+        _exact_odds_cache[key] = result
+    number_of_draws, hand_type_counts = result
+    return number_of_draws, dict(hand_type_counts)
+
+
+def _count_hand_types(kept_codes, discarded_codes):
+    """Scores every draw of replacement cards for the kept cards."""
+    dead_codes = set(kept_codes) | set(discarded_codes)
+    unseen = [
+        CARD_INTS[card.code] for card in Deck().cards
+        if card.code not in dead_codes
+    ]
+    kept = tuple(CARD_INTS[code] for code in kept_codes)
+    tally = [0] * (ROYAL_FLUSH + 1)
+    number_of_draws = 0
+    for drawn in combinations(unseen, len(discarded_codes)):
+        tally[evaluate_ints(*(kept + drawn)) >> 8] += 1
+        number_of_draws += 1
+    hand_type_counts = dict(
+        (hand_type, tally[hand_type])
+        for hand_type in range(HIGH_CARD, ROYAL_FLUSH + 1)
+    )
+    return number_of_draws, hand_type_counts
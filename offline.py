@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Minimal stand-ins for the App Engine SDK modules the game imports.
+
+Command line tools (simulations and benchmarks) call install() before
+importing game.py so the game logic can run on a machine without the SDK.
+Nothing here talks to a datastore; entities are plain attribute holders.
+When the SDK is importable install() does nothing.
+"""
+import base64
+import itertools
+import sys
+import types
+
+
+class ServiceException(Exception):
+    """Stand-in for endpoints.ServiceException."""
+
+
+class BadRequestException(ServiceException):
+    pass
+
+
+class UnauthorizedException(ServiceException):
+    pass
+
+
+class ForbiddenException(ServiceException):
+    pass
+
+
+class NotFoundException(ServiceException):
+    pass
+
+
+class ConflictException(ServiceException):
+    pass
+
+
+def _decorator(*args, **kwargs):
+    """Stand-in for decorator factories such as endpoints.method."""
+    return lambda decorated: decorated
+
+
+def _api_server(services, **kwargs):
+    """Stand-in for endpoints.api_server."""
+    return None
+
+
+class _EnumValue(object):
+    """A protorpc enum value with a name and a number."""
+    def __init__(self, name, number):
+        self.name = name
+        self.number = number
+
+    def __str__(self):
+        return self.name
+
+    def __int__(self):
+        return self.number
+
+
+class _EnumType(type):
+    """Turns integer class attributes into enum values like protorpc."""
+    def __init__(cls, name, bases, attributes):
+        super(_EnumType, cls).__init__(name, bases, attributes)
+        for attribute, value in list(attributes.items()):
+            if isinstance(value, int) and not attribute.startswith('_'):
+                setattr(cls, attribute, _EnumValue(attribute, value))
+
+
+Enum = _EnumType('Enum', (object,), {})
+
+
+class _Field(object):
+    """Stand-in for protorpc message fields."""
+    def __init__(self, *args, **kwargs):
+        self.repeated = kwargs.get('repeated', False)
+        self.default = kwargs.get('default')
+
+
+class Message(object):
+    """Stand-in for protorpc.messages.Message."""
+    def __init__(self, **kwargs):
+        for name in dir(type(self)):
+            field = getattr(type(self), name)
+            if isinstance(field, _Field):
+                setattr(self, name, [] if field.repeated else field.default)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+
+class Key(object):
+    """Stand-in for ndb.Key; a kind and an id with optional parent."""
+    def __init__(self, kind, id, parent=None):
+        if not isinstance(kind, str):
+            kind = kind.__name__
+        self._pairs = (parent._pairs if parent else ()) + ((kind, id),)
+
+    def kind(self):
+        return self._pairs[-1][0]
+
+    def id(self):
+        return self._pairs[-1][1]
+
+    def parent(self):
+        if len(self._pairs) == 1:
+            return None
+        key = Key.__new__(Key)
+        key._pairs = self._pairs[:-1]
+        return key
+
+    def urlsafe(self):
+        path = '/'.join('{0}:{1}'.format(kind, id) for kind, id in self._pairs)
+        return base64.urlsafe_b64encode(path.encode('utf-8')).decode('ascii')
+
+    def __eq__(self, other):
+        return isinstance(other, Key) and self._pairs == other._pairs
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._pairs)
+
+    def __repr__(self):
+        return 'Key{0!r}'.format(self._pairs)
+
+
+class Property(object):
+    """Stand-in for ndb properties; stores values on the entity."""
+    def __init__(self, *args, **kwargs):
+        self._name = None
+        self._default = kwargs.get('default')
+        self._repeated = kwargs.get('repeated', False)
+
+    def __get__(self, entity, owner):
+        if entity is None:
+            return self
+        default = [] if self._repeated else self._default
+        return entity._values.get(self._name, default)
+
+    def __set__(self, entity, value):
+        entity._values[self._name] = value
+
+    def __eq__(self, value):
+        return (self._name, '=', value)
+
+    def __ne__(self, value):
+        return (self._name, '!=', value)
+
+    def __neg__(self):
+        return ('-', self._name)
+
+    __hash__ = object.__hash__
+
+
+class ComputedProperty(Property):
+    """Stand-in for ndb.ComputedProperty."""
+    def __init__(self, function, *args, **kwargs):
+        super(ComputedProperty, self).__init__(*args, **kwargs)
+        self._function = function
+
+    def __get__(self, entity, owner):
+        if entity is None:
+            return self
+        return self._function(entity)
+
+
+class _ModelType(type):
+    """Names each property after the attribute it is assigned to."""
+    def __init__(cls, name, bases, attributes):
+        super(_ModelType, cls).__init__(name, bases, attributes)
+        for attribute, value in attributes.items():
+            if isinstance(value, Property):
+                value._name = attribute
+
+
+class _ModelBase(object):
+    """Stand-in for ndb.Model without any datastore access.
+
+    There is no put or query; keep entities in storage.MemoryStorage.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, key=None, parent=None, id=None, **kwargs):
+        self._values = {}
+        if key is None and id is not None:
+            key = Key(type(self), id, parent=parent)
+        self.key = key
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def allocate_ids(cls, size=1, parent=None):
+        first = next(cls._ids)
+        for _ in range(size - 1):
+            next(cls._ids)
+        return (first, first + size - 1)
+
+
+Model = _ModelType('Model', (_ModelBase,), {})
+
+
+def transactional(*args, **kwargs):
+    """Stand-in for ndb.transactional; runs the function as is."""
+    return lambda function: function
+
+
+def transaction(callback, *args, **kwargs):
+    """Stand-in for ndb.transaction."""
+    return callback()
+
+
+class Return(StopIteration):
+    """Stand-in for ndb.Return."""
+
+
+def tasklet(function):
+    """Stand-in for ndb.tasklet; tasklets only run against the datastore."""
+    return function
+
+
+def _filter(*nodes):
+    return nodes
+
+
+def _task_add(*args, **kwargs):
+    """Stand-in for taskqueue.add; tasks are dropped."""
+    return None
+
+
+class Task(object):
+    """Stand-in for taskqueue.Task; keeps its arguments as attributes."""
+    def __init__(self, payload=None, url=None, params=None, name=None,
+                 countdown=None, **kwargs):
+        self.payload = payload
+        self.url = url
+        self.params = params
+        self.name = name
+        self.countdown = countdown
+
+
+class Queue(object):
+    """Stand-in for taskqueue.Queue; tasks are dropped."""
+    def __init__(self, name='default'):
+        self.name = name
+
+    def add(self, task, transactional=False):
+        return task
+
+    def add_async(self, task, transactional=False):
+        return _Done(task)
+
+
+class _Done(object):
+    """Stand-in for the RPC returned by Queue.add_async.
+
+    Like storage.Done, but defined here since the stand-ins are installed
+    before any app module can be imported.
+    """
+    def __init__(self, result):
+        self._result = result
+
+    def get_result(self):
+        return self._result
+
+
+class TaskAlreadyExistsError(Exception):
+    pass
+
+
+class DuplicateTaskNameError(Exception):
+    pass
+
+
+class BadTransactionStateError(Exception):
+    pass
+
+
+class TombstonedTaskError(Exception):
+    pass
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def _build_modules():
+    """Returns the stand-in modules keyed by module name."""
+    field = _Field
+    ndb = _module(
+        'google.appengine.ext.ndb',
+        Model=Model,
+        Key=Key,
+        Property=Property,
+        StringProperty=Property,
+        TextProperty=Property,
+        IntegerProperty=Property,
+        FloatProperty=Property,
+        BooleanProperty=Property,
+        BlobProperty=Property,
+        JsonProperty=Property,
+        KeyProperty=Property,
+        StructuredProperty=Property,
+        LocalStructuredProperty=Property,
+        DateTimeProperty=Property,
+        ComputedProperty=ComputedProperty,
+        transactional=transactional,
+        transaction=transaction,
+        tasklet=tasklet,
+        Return=Return,
+        AND=_filter,
+        OR=_filter
+    )
+    taskqueue = _module(
+        'google.appengine.api.taskqueue',
+        add=_task_add,
+        Task=Task,
+        Queue=Queue,
+        TaskAlreadyExistsError=TaskAlreadyExistsError,
+        DuplicateTaskNameError=DuplicateTaskNameError,
+        BadTransactionStateError=BadTransactionStateError,
+        TombstonedTaskError=TombstonedTaskError,
+        MAX_TASKS_PER_ADD=100
+    )
+    messages = _module(
+        'protorpc.messages',
+        Enum=Enum,
+        Message=Message,
+        StringField=field,
+        IntegerField=field,
+        FloatField=field,
+        BooleanField=field,
+        BytesField=field,
+        EnumField=field,
+        MessageField=field
+    )
+    message_types = _module(
+        'protorpc.message_types',
+        VoidMessage=type('VoidMessage', (Message,), {})
+    )
+    remote = _module('protorpc.remote', Service=object)
+    endpoints = _module(
+        'endpoints',
+        ServiceException=ServiceException,
+        BadRequestException=BadRequestException,
+        UnauthorizedException=UnauthorizedException,
+        ForbiddenException=ForbiddenException,
+        NotFoundException=NotFoundException,
+        ConflictException=ConflictException,
+        api=_decorator,
+        method=_decorator,
+        api_server=_api_server
+    )
+    return {
+        'endpoints': endpoints,
+        'google': _module('google'),
+        'google.appengine': _module('google.appengine'),
+        'google.appengine.api': _module(
+            'google.appengine.api', taskqueue=taskqueue
+        ),
+        'google.appengine.api.taskqueue': taskqueue,
+        'google.appengine.ext': _module('google.appengine.ext', ndb=ndb),
+        'google.appengine.ext.ndb': ndb,
+        'protorpc': _module(
+            'protorpc',
+            messages=messages,
+            message_types=message_types,
+            remote=remote
+        ),
+        'protorpc.messages': messages,
+        'protorpc.message_types': message_types,
+        'protorpc.remote': remote
+    }
+
+
+def is_sdk_available():
+    """Returns True when the App Engine SDK can be imported."""
+    try:
+        import google.appengine.ext.ndb  # noqa
+    except ImportError:
+        return False
+    return True
+
+
+def install():
+    """Registers the stand-in modules unless the SDK is available.
+
+    Returns:
+      True if the stand-ins were installed.
+    """
+    if is_sdk_available():
+        return False
+    for name, module in _build_modules().items():
+        sys.modules.setdefault(name, module)
+    return True
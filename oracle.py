@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Classifies every five card hand and checks the results against known counts.
+
+All 2,598,960 hands are classified with Poker.determine_hand_type and ranked
+with the evaluator game_outcome uses. The number of hands of each type and
+the number of distinct ranks of each type must match the known values
+exactly, so any faster evaluator has to pass this unchanged. Runs without the
+App Engine SDK (see offline.py); exits with 1 on any mismatch.
+
+Usage:
+  python oracle.py --processes 4
+"""
+from __future__ import print_function
+
+import argparse
+from collections import Counter
+from itertools import combinations
+import json
+import multiprocessing
+import sys
+import time
+
+import offline
+offline.install()
+
+import evaluator  # noqa
+from game import Poker  # noqa
+from game import STANDARD_CARDS  # noqa
+
+# Hand type: (number of hands, number of distinct ranks). The ranks follow
+# the game's tie breakers rather than full poker kicker rules: high cards and
+# flushes compare their highest card, four of a kind, full houses and three
+# of a kind their grouped card, two pairs both pairs and a pair the pair and
+# the highest other card.
+
+EXPECTED = {
+    evaluator.ROYAL_FLUSH: (4, 1),
+    evaluator.STRAIGHT_FLUSH: (36, 9),
+    evaluator.FOUR_OF_A_KIND: (624, 13),
+    evaluator.FULL_HOUSE: (3744, 13),
+    evaluator.FLUSH: (5108, 8),
+    evaluator.STRAIGHT: (10200, 10),
+    evaluator.THREE_OF_A_KIND: (54912, 13),
+    evaluator.TWO_PAIR: (123552, 78),
+    evaluator.PAIR: (1098240, 130),
+    evaluator.HIGH_CARD: (1302540, 8)
+}
+HAND_TYPE_NAMES = {
+    evaluator.ROYAL_FLUSH: 'royal flush',
+    evaluator.STRAIGHT_FLUSH: 'straight flush',
+    evaluator.FOUR_OF_A_KIND: 'four of a kind',
+    evaluator.FULL_HOUSE: 'full house',
+    evaluator.FLUSH: 'flush',
+    evaluator.STRAIGHT: 'straight',
+    evaluator.THREE_OF_A_KIND: 'three of a kind',
+    evaluator.TWO_PAIR: 'two pair',
+    evaluator.PAIR: 'pair',
+    evaluator.HIGH_CARD: 'high card'
+}
+
+
+def classify_hands(first_card):
+    """Classifies every hand whose lowest card code is first_card.
+
+    Returns:
+      A tuple of a dictionary of hand type to number of hands and a
+      dictionary of hand type to the set of ranks seen.
+    """
+    determine_hand_type = Poker.determine_hand_type
+    evaluate = evaluator.evaluate
+    counts = Counter()
+    ranks = dict((hand_type, set()) for hand_type in EXPECTED)
+    card = STANDARD_CARDS[first_card]
+    for others in combinations(STANDARD_CARDS[first_card + 1:], 4):
+        hand = (card,) + others
+        hand_type = determine_hand_type(hand)
+        counts[hand_type] += 1
+        ranks[hand_type].add(evaluate([c.code for c in hand]))
+    return dict(counts), ranks
+
+
+def run(processes=1):
+    """Classifies every hand, split by lowest card across a process pool.
+
+    Returns:
+      A report with the wall clock seconds, hands per second and, for each
+      hand type, the hands and distinct ranks found and expected.
+    """
+    first_cards = range(len(STANDARD_CARDS) - 4)
+    processes = max(1, processes)
+
+    started = time.time()
+    if processes == 1:
+        results = [classify_hands(first_card) for first_card in first_cards]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(classify_hands, first_cards, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    elapsed = time.time() - started
+
+    counts = Counter()
+    ranks = dict((hand_type, set()) for hand_type in EXPECTED)
+    for result_counts, result_ranks in results:
+        counts.update(result_counts)
+        for hand_type, hand_ranks in result_ranks.items():
+            ranks[hand_type].update(hand_ranks)
+
+    hands = sum(counts.values())
+    hand_types = {}
+    for hand_type, (expected_hands, expected_ranks) in EXPECTED.items():
+        hand_types[HAND_TYPE_NAMES[hand_type]] = {
+            'hands': counts.get(hand_type, 0),
+            'expected_hands': expected_hands,
+            'ranks': len(ranks[hand_type]),
+            'expected_ranks': expected_ranks
+        }
+    unknown = set(counts).difference(EXPECTED)
+    return {
+        'hands': hands,
+        'processes': processes,
+        'seconds': elapsed,
+        'hands_per_second': hands / elapsed if elapsed else 0,
+        'hand_types': hand_types,
+        'unknown_hand_types': sorted(unknown),
+        'passed': not unknown and all(
+            result['hands'] == result['expected_hands'] and
+            result['ranks'] == result['expected_ranks']
+            for result in hand_types.values()
+        )
+    }
+
+
+def format_report(report):
+    """Returns a human readable summary of a run."""
+    lines = [
+        '{0} hands in {1:.2f}s on {2} process(es): {3:.0f} hands/s'.format(
+            report['hands'],
+            report['seconds'],
+            report['processes'],
+            report['hands_per_second']
+        ),
+        '',
+        '  {0:<16} {1:>8} {2:>8} {3:>6} {4:>6}'.format(
+            'hand type', 'hands', 'expected', 'ranks', 'expected'
+        )
+    ]
+    for hand_type in range(evaluator.ROYAL_FLUSH, evaluator.HIGH_CARD - 1, -1):
+        result = report['hand_types'][HAND_TYPE_NAMES[hand_type]]
+        matches = (
+            result['hands'] == result['expected_hands'] and
+            result['ranks'] == result['expected_ranks']
+        )
+        lines.append('  {0:<16} {1:8d} {2:8d} {3:6d} {4:6d}{5}'.format(
+            HAND_TYPE_NAMES[hand_type],
+            result['hands'],
+            result['expected_hands'],
+            result['ranks'],
+            result['expected_ranks'],
+            '' if matches else '  MISMATCH'
+        ))
+    if report['unknown_hand_types']:
+        lines.append('  unknown hand types: {0}'.format(
+            report['unknown_hand_types']
+        ))
+    lines.extend(['', 'PASSED' if report['passed'] else 'FAILED'])
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument(
+        '--processes', type=int, default=multiprocessing.cpu_count()
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='print the report as JSON'
+    )
+    arguments = parser.parse_args()
+
+    report = run(arguments.processes)
+    if arguments.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(format_report(report))
+    if not report['passed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
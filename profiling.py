@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Opt-in cProfile of the game logic hot paths.
+
+Profiling is configured with environment variables (env_variables in
+app.yaml):
+
+  PROFILE_SAMPLE_RATE: fraction of requests to profile, 0 (default) to 1.
+  PROFILE_KEY: requests with an X-Profile header equal to this value are
+    profiled; the header is ignored when unset.
+  PROFILE_OUTPUT: optional file the aggregated pstats are dumped to after
+    every profiled request (development servers and offline tools only).
+
+When neither PROFILE_SAMPLE_RATE nor PROFILE_KEY is set nothing is wrapped
+and the game logic runs without any profiling overhead. Only the functions
+in PROFILED_FUNCTIONS are profiled, including what they call; the
+aggregated stats are returned by get_stats_text (see getProfileStats).
+"""
+import cProfile
+import functools
+import os
+import pstats
+import random
+import threading
+from StringIO import StringIO
+
+from game import Deck
+from game import Poker
+
+PROFILED_FUNCTIONS = (
+    (Poker, (
+        'new_game',
+        'new_games',
+        'make_move',
+        'game_outcome',
+        'serialize_hand',
+        'load_player_hand',
+        'load_deck',
+        'save_deck'
+    )),
+    (Deck, ('serialize', 'deserialize', 'from_seed'))
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_aggregate = {'stats': None, 'requests': 0}
+_installed = []
+
+
+def get_sample_rate():
+    """Returns the fraction of requests to profile."""
+    try:
+        return float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    except ValueError:
+        return 0.0
+
+
+def is_enabled():
+    """Returns True when some requests may be profiled."""
+    return get_sample_rate() > 0 or bool(os.environ.get('PROFILE_KEY'))
+
+
+def _profiled(function):
+    """Wraps a function to run under the profiler of a profiled request."""
+    @functools.wraps(function)
+    def run_profiled(*args, **kwargs):
+        profiler = getattr(_local, 'profiler', None)
+        if profiler is None or _local.depth:
+            return function(*args, **kwargs)
+        _local.depth += 1
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _local.depth -= 1
+    return run_profiled
+
+
+def install():
+    """Wraps the PROFILED_FUNCTIONS if profiling is enabled.
+
+    Safe to call more than once.
+
+    Returns:
+      True if the functions are wrapped.
+    """
+    if _installed:
+        return True
+    if not is_enabled():
+        return False
+    for cls, names in PROFILED_FUNCTIONS:
+        for name in names:
+            attribute = cls.__dict__[name]
+            if isinstance(attribute, staticmethod):
+                wrapped = staticmethod(_profiled(attribute.__func__))
+            elif isinstance(attribute, classmethod):
+                wrapped = classmethod(_profiled(attribute.__func__))
+            else:
+                wrapped = _profiled(attribute)
+            setattr(cls, name, wrapped)
+    _installed.append(True)
+    return True
+
+
+def _should_profile(environ):
+    """Decides whether to profile a request."""
+    profile_key = os.environ.get('PROFILE_KEY')
+    if profile_key and environ.get('HTTP_X_PROFILE') == profile_key:
+        return True
+    return random.random() < get_sample_rate()
+
+
+class ProfileRequests(object):
+    """WSGI middleware profiling a sample of requests.
+
+    The profile of each profiled request is added to the aggregated stats.
+    """
+    def __init__(self, app):
+        self.app = app
+        install()
+
+    def __call__(self, environ, start_response):
+        if not _installed or not _should_profile(environ):
+            return self.app(environ, start_response)
+
+        profiler = _local.profiler = cProfile.Profile()
+        _local.depth = 0
+        try:
+            return self.app(environ, start_response)
+        finally:
+            _local.profiler = None
+            _add_profile(profiler)
+
+
+def _add_profile(profiler):
+    """Adds a request's profile to the aggregated stats."""
+    profiler.create_stats()
+    if not profiler.stats:
+        return
+    with _lock:
+        if _aggregate['stats'] is None:
+            _aggregate['stats'] = pstats.Stats(profiler)
+        else:
+            _aggregate['stats'].add(profiler)
+        _aggregate['requests'] += 1
+        output = os.environ.get('PROFILE_OUTPUT')
+        if output:
+            _aggregate['stats'].dump_stats(output)
+
+
+def get_stats_text(sort='cumulative', limit=40):
+    """Returns the aggregated stats as text, or an empty string.
+
+    Args:
+      sort: pstats sort key, e.g. cumulative, tottime or calls.
+      limit: number of functions to list.
+    """
+    stream = StringIO()
+    with _lock:
+        if _aggregate['stats'] is None:
+            return ''
+        stream.write('{0} profiled requests\n'.format(_aggregate['requests']))
+        _aggregate['stats'].stream = stream
+        _aggregate['stats'].sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def reset():
+    """Forgets the aggregated stats."""
+    with _lock:
+        _aggregate['stats'] = None
+        _aggregate['requests'] = 0
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Plays complete games headlessly to benchmark the game logic.
+
+Games go through the same Deck, Poker.get_new_cards, Poker.game_outcome and
+serialization code the API uses, but state is kept in an in-memory dictionary
+instead of the datastore, so this runs without the App Engine SDK.
+
+Usage:
+  python simulate.py --games 100000 --processes 4 --seed 1
+"""
+from __future__ import print_function
+
+import argparse
+from collections import Counter
+import json
+import multiprocessing
+import random
+import struct
+import time
+
+import offline
+offline.install()
+
+import evaluator  # noqa
+from game import Deck  # noqa
+from game import Poker  # noqa
+
+STAGES = ('deal', 'exchange', 'evaluate', 'serialize')
+OUTCOMES = ('tie', 'player_one', 'player_two')
+
+
+def choose_card_ids_to_exchange(hand):
+    """Picks the cards a simulated player exchanges.
+
+    Stands on a straight or better, otherwise keeps the cards that make a pair
+    or better and exchanges the rest. With nothing to keep, only the highest
+    card is kept.
+    """
+    if Poker.determine_hand_type(hand) >= evaluator.STRAIGHT:
+        return []
+    card_counts = Counter(card.value for card in hand)
+    card_ids = [card.id for card in hand if card_counts[card.value] == 1]
+    if len(card_ids) == len(hand):
+        highest_card = max(hand, key=lambda card: card.value)
+        card_ids.remove(highest_card.id)
+    return card_ids
+
+
+def play_games(number_of_games, seed):
+    """Plays games and returns their timings and outcomes.
+
+    Args:
+      number_of_games: how many games to play.
+      seed: seed for the random deck seeds, so runs are repeatable.
+
+    Returns:
+      A dictionary with the number of games, seconds spent in each stage,
+      outcome counts and final hand type counts.
+    """
+    rng = random.Random(seed)
+    store = {}
+    timings = dict((stage, 0.0) for stage in STAGES)
+    outcomes = Counter()
+    hand_types = Counter()
+    clock = time.time
+
+    for game_id in range(number_of_games):
+        # Deal
+
+        started = clock()
+        deck_seed = struct.pack('>4I', *[rng.getrandbits(32) for _ in '1234'])
+        deck = Deck(seed=deck_seed)
+        deck.shuffle()
+        player_one_hand = deck.draw(5)
+        player_two_hand = deck.draw(5)
+        dealt = clock()
+        timings['deal'] += dealt - started
+
+        # Store the game like Poker.new_game and load it back like
+        # Poker.make_move does.
+
+        store[game_id] = {
+            'deck_seed': deck.seed,
+            'deck_position': deck.position,
+            'player_one': Poker.serialize_hand(player_one_hand),
+            'player_two': Poker.serialize_hand(player_two_hand)
+        }
+        entity = store[game_id]
+        deck = Deck.from_seed(entity['deck_seed'], entity['deck_position'])
+        player_one_hand = Poker.load_player_hand(entity['player_one'])
+        player_two_hand = Poker.load_player_hand(entity['player_two'])
+        serialized = clock()
+        timings['serialize'] += serialized - dealt
+
+        # Exchange
+
+        player_one_hand = Poker.get_new_cards(
+            deck,
+            player_one_hand,
+            choose_card_ids_to_exchange(player_one_hand)
+        )
+        player_two_hand = Poker.get_new_cards(
+            deck,
+            player_two_hand,
+            choose_card_ids_to_exchange(player_two_hand)
+        )
+        exchanged = clock()
+        timings['exchange'] += exchanged - serialized
+
+        # Evaluate
+
+        outcome = Poker.game_outcome(player_one_hand, player_two_hand)
+        evaluated = clock()
+        timings['evaluate'] += evaluated - exchanged
+
+        entity['deck_position'] = deck.position
+        entity['player_one'] = Poker.serialize_hand(player_one_hand)
+        entity['player_two'] = Poker.serialize_hand(player_two_hand)
+        timings['serialize'] += clock() - evaluated
+
+        outcomes[OUTCOMES[outcome]] += 1
+        hand_types[Poker.determine_hand_type(player_one_hand)] += 1
+        hand_types[Poker.determine_hand_type(player_two_hand)] += 1
+        del store[game_id]
+
+    return {
+        'games': number_of_games,
+        'timings': timings,
+        'outcomes': dict(outcomes),
+        'hand_types': dict(hand_types)
+    }
+
+
+def _play_games(arguments):
+    """Unpacks pool arguments for play_games."""
+    return play_games(*arguments)
+
+
+def run(number_of_games, processes=1, seed=None):
+    """Plays games across a process pool and combines the results.
+
+    Returns:
+      The combined play_games results plus the wall clock seconds and games
+      per second of the whole run.
+    """
+    rng = random.Random(seed)
+    processes = max(1, min(processes, number_of_games))
+    chunks = [
+        (number_of_games // processes +
+         (1 if i < number_of_games % processes else 0),
+         rng.getrandbits(64))
+        for i in range(processes)
+    ]
+
+    started = time.time()
+    if processes == 1:
+        results = [_play_games(chunks[0])]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_play_games, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    elapsed = time.time() - started
+
+    report = {
+        'games': 0,
+        'processes': processes,
+        'seconds': elapsed,
+        'timings': dict((stage, 0.0) for stage in STAGES),
+        'outcomes': Counter(),
+        'hand_types': Counter()
+    }
+    for result in results:
+        report['games'] += result['games']
+        for stage in STAGES:
+            report['timings'][stage] += result['timings'][stage]
+        report['outcomes'].update(result['outcomes'])
+        report['hand_types'].update(result['hand_types'])
+    report['games_per_second'] = report['games'] / elapsed if elapsed else 0
+    report['outcomes'] = dict(report['outcomes'])
+    report['hand_types'] = dict(report['hand_types'])
+    return report
+
+
+def format_report(report):
+    """Returns a human readable summary of a run."""
+    games = report['games'] or 1
+    lines = [
+        '{0} games in {1:.2f}s on {2} process(es): {3:.0f} games/s'.format(
+            report['games'],
+            report['seconds'],
+            report['processes'],
+            report['games_per_second']
+        ),
+        '',
+        'Stage timings (CPU seconds summed over processes, us per game):'
+    ]
+    for stage in STAGES:
+        lines.append('  {0:<10} {1:8.3f}s {2:8.2f}us'.format(
+            stage,
+            report['timings'][stage],
+            report['timings'][stage] * 1e6 / games
+        ))
+    lines.extend(['', 'Outcomes:'])
+    for outcome in OUTCOMES:
+        count = report['outcomes'].get(outcome, 0)
+        lines.append('  {0:<10} {1:8d} {2:6.2f}%'.format(
+            outcome, count, 100.0 * count / games
+        ))
+    lines.extend(['', 'Final hand types (both players):'])
+    for hand_type in range(evaluator.ROYAL_FLUSH, evaluator.HIGH_CARD - 1, -1):
+        count = report['hand_types'].get(hand_type, 0)
+        lines.append('  {0:<10} {1:8d} {2:6.2f}%'.format(
+            hand_type, count, 50.0 * count / games
+        ))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument(
+        '--processes', type=int, default=multiprocessing.cpu_count()
+    )
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument(
+        '--json', action='store_true', help='print the report as JSON'
+    )
+    arguments = parser.parse_args()
+
+    report = run(arguments.games, arguments.processes, arguments.seed)
+    if arguments.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
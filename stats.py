@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+from collections import namedtuple
+import functools
+import random
+import time
+
+from google.appengine.ext import ndb
+
+import cache
+import leaderboard
+import notifications
+from model import PlayerStatsShard
+from storage import get_storage
+
+NUMBER_OF_SHARDS = 10
+
+# Game results are copied to the User (for the points index used by the
+# rankings) at most once every SYNC_SECONDS per player.
+
+SYNC_SECONDS = 10
+
+PlayerStats = namedtuple('PlayerStats', ['wins', 'ties', 'losses', 'points'])
+
+_STATS_PREFIX = 'player-stats:'
+
+
+def _get_shard_keys(user_key):
+    """Returns the keys of a player's stats shards.
+
+    Shard 0 holds the record the player had before stats were sharded; game
+    results are added to the other shards.
+    """
+    return [
+        ndb.Key(
+            PlayerStatsShard,
+            '{0}-{1}'.format(user_key.id(), shard_number)
+        )
+        for shard_number in range(NUMBER_OF_SHARDS + 1)
+    ]
+
+
+def record_game_result(game):
+    """Add a finished game to both players' stats.
+
+    Each player's result is added to one of their shards picked at random,
+    so games finishing at the same time rarely write the same entity. Call
+    it in the transaction that ends the game so no result is lost; with the
+    game that transaction spans three entity groups. Copying the new totals
+    to the Users is left to a task queued once the transaction commits.
+
+    Args:
+      game: a finished Game.
+    """
+    if game.winner is None:
+        results = [(game.player_one, 'ties'), (game.player_two, 'ties')]
+    elif game.winner == game.player_one:
+        results = [(game.player_one, 'wins'), (game.player_two, 'losses')]
+    else:
+        results = [(game.player_one, 'losses'), (game.player_two, 'wins')]
+
+    increments = [
+        (random.choice(_get_shard_keys(user_key)[1:]), result)
+        for user_key, result in results
+    ]
+    get_storage().transaction(_increment_shards, increments)
+
+    for user_key, _ in results:
+        cache.invalidate([_STATS_PREFIX + user_key.urlsafe()])
+        get_storage().on_commit(functools.partial(_schedule_sync, user_key))
+
+
+def _increment_shards(increments):
+    """Adds one to a stat of each shard.
+
+    Args:
+      increments: a list of (shard key, stat name).
+    """
+    shards = get_storage().get_multi([key for key, _ in increments])
+    for i, (shard_key, result) in enumerate(increments):
+        if shards[i] is None:
+            shards[i] = PlayerStatsShard(key=shard_key)
+        setattr(shards[i], result, getattr(shards[i], result) + 1)
+    get_storage().put_multi(shards)
+
+
+def _schedule_sync(user_key):
+    """Queues copying a player's totals to their User.
+
+    Tasks are named after the player and the current SYNC_SECONDS window,
+    so results from the same window share one task.
+    """
+    window = int(time.time() // SYNC_SECONDS)
+    notifications.add(
+        url='/tasks/sync_player_stats',
+        params={'user_key': user_key.urlsafe()},
+        name='sync-player-stats-{0}-{1}'.format(user_key.id(), window),
+        countdown=SYNC_SECONDS
+    )
+
+
+def _total(user, shards):
+    """Adds up a player's shards.
+
+    Players whose shard 0 does not exist yet still have their record from
+    before stats were sharded on their User.
+    """
+    base = shards[0] if shards[0] is not None else user
+    wins, ties, losses = base.wins, base.ties, base.losses
+    for shard in shards[1:]:
+        if shard is not None:
+            wins += shard.wins
+            ties += shard.ties
+            losses += shard.losses
+    return PlayerStats(
+        wins=wins,
+        ties=ties,
+        losses=losses,
+        points=(wins * 3) + (ties * 2) + losses
+    )
+
+
+def get_player_stats(user):
+    """Returns a player's current PlayerStats, reading through the cache."""
+    return cache.read_through(
+        _STATS_PREFIX + user.key.urlsafe(),
+        lambda: _total(
+            user, get_storage().get_multi(_get_shard_keys(user.key))
+        )
+    )
+
+
+def sync_user(user_key):
+    """Copy a player's totals to their User and update the leaderboard.
+
+    The shards are read before the transaction, so it only writes the User
+    and one leaderboard shard. Shards only grow, so a sync that read older
+    shards than the User already has never lowers its totals.
+    """
+    shard_keys = _get_shard_keys(user_key)
+    shards = get_storage().get_multi(shard_keys)
+    if shards[0] is None:
+        shards[0] = get_storage().transaction(
+            _create_base_shard, user_key, shard_keys[0]
+        )
+    get_storage().transaction(_sync_user, user_key, shards)
+
+
+def _create_base_shard(user_key, shard_key):
+    """Keep the record a player had before stats were sharded in shard 0.
+
+    The User still holds that record since only _sync_user changes it, and
+    _sync_user only runs once shard 0 exists.
+
+    Returns:
+      Shard 0 of the player.
+    """
+    shard, user = get_storage().get_multi([shard_key, user_key])
+    if shard is None:
+        shard = PlayerStatsShard(
+            key=shard_key,
+            wins=user.wins,
+            ties=user.ties,
+            losses=user.losses
+        )
+        get_storage().put(shard)
+    return shard
+
+
+def _sync_user(user_key, shards):
+    user = get_storage().get(user_key)
+    player_stats = _total(user, shards)
+    games = player_stats.wins + player_stats.ties + player_stats.losses
+    if games <= user.wins + user.ties + user.losses:
+        return
+
+    old_points = user.points if user.on_leaderboard else 0
+    user.wins = player_stats.wins
+    user.ties = player_stats.ties
+    user.losses = player_stats.losses
+    user.on_leaderboard = True
+    get_storage().put(user)
+    leaderboard.record_points_changes([(old_points, user.points)])
+    cache.invalidate_users([user])
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import functools
+import itertools
+
+from google.appengine.ext import ndb
+
+import notifications
+from model import Backfill
+from model import Game
+from model import Hand
+from model import User
+from model import UserName
+
+
+class Done(object):
+    """A future that already has its result or error; see MemoryStorage."""
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._error = error
+
+    def get_result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class NdbStorage(object):
+    """Reads and writes User, Game and Hand entities with the datastore."""
+    _user_names_backfilled = False
+
+    def get(self, key):
+        """Returns the entity for a key or None."""
+        return key.get()
+
+    def get_async(self, key):
+        """Starts getting the entity for a key; returns a future."""
+        return key.get_async()
+
+    def get_multi(self, keys):
+        """Returns the entities for a list of keys in one batch."""
+        return ndb.get_multi(keys)
+
+    def put(self, entity):
+        """Saves an entity and returns its key."""
+        return entity.put()
+
+    def put_multi(self, entities):
+        """Saves entities in one batch and returns their keys."""
+        return ndb.put_multi(entities)
+
+    def get_user_by_name(self, name):
+        """Returns the User with a name or None."""
+        return self.get_user_by_name_async(name).get_result()
+
+    @ndb.tasklet
+    def get_user_by_name_async(self, name):
+        """Starts looking up the User with a name; returns a future."""
+        user_name = yield UserName.get_key(name).get_async()
+        if user_name is not None:
+            user = yield user_name.user.get_async()
+            raise ndb.Return(user)
+
+        # Users created before names were reserved with UserName whose name
+        # the backfill (see main.BackfillUserNames) has not reserved yet.
+
+        backfilled = yield self._are_user_names_backfilled_async()
+        if backfilled:
+            raise ndb.Return(None)
+        user = yield User.query(User.name == name).get_async()
+        raise ndb.Return(user)
+
+    @ndb.tasklet
+    def _are_user_names_backfilled_async(self):
+        """Starts checking whether every User has a UserName.
+
+        Once the backfill has finished it stays finished, so the answer is
+        kept for the life of the instance.
+        """
+        if not self._user_names_backfilled:
+            backfill = yield Backfill.get_key(Backfill.USER_NAMES).get_async()
+            self._user_names_backfilled = backfill is not None
+        raise ndb.Return(self._user_names_backfilled)
+
+    def get_users_by_name(self, names):
+        """Returns Users by name with batch gets.
+
+        Returns:
+          A dictionary of name to User; names without a User are left out.
+        """
+        names = list(names)
+        user_names = ndb.get_multi([UserName.get_key(name) for name in names])
+        user_keys = [
+            user_name.user for user_name in user_names if user_name is not None
+        ]
+        users = dict(
+            (user.name, user)
+            for user in ndb.get_multi(user_keys) if user is not None
+        )
+        for name, user_name in zip(names, user_names):
+            if user_name is None:
+                user = self.get_user_by_name(name)
+                if user is not None:
+                    users[name] = user
+        return users
+
+    def create_user(self, name, email):
+        """Creates a User unless the name is taken.
+
+        Until the backfill (see main.BackfillUserNames) has reserved the
+        names of Users created before UserName existed, those are also
+        looked for by name. They are old, so the query sees them.
+
+        Returns:
+          The new User or None if a User with the name already exists.
+        """
+        if not self._are_user_names_backfilled_async().get_result():
+            if User.query(User.name == name).get(keys_only=True) is not None:
+                return None
+        user_key = ndb.Key(User, User.allocate_ids(size=1)[0])
+        return self.transaction(self._create_user, user_key, name, email)
+
+    def _create_user(self, user_key, name, email):
+        """Reserves a name and creates its User in one transaction."""
+        name_key = UserName.get_key(name)
+        if name_key.get() is not None:
+            return None
+        user = User(key=user_key, name=name, email=email)
+        ndb.put_multi([user, UserName(key=name_key, user=user_key)])
+        return user
+
+    def get_game_hands(self, game):
+        """Returns a game's hands in one batch get.
+
+        Returns:
+          A dictionary of hand id (see Hand.get_id) to Hand.
+        """
+        return self.get_game_hands_async(game).get_result()
+
+    @ndb.tasklet
+    def get_game_hands_async(self, game):
+        """Starts getting a game's hands; returns a future."""
+        hand_ids = Hand.get_ids(game)
+        hands = yield ndb.get_multi_async([
+            ndb.Key(Hand, hand_id, parent=game.key) for hand_id in hand_ids
+        ])
+        game_hands = dict((hand.key.id(), hand) for hand in hands if hand)
+        if len(game_hands) < len(hand_ids) and not self._has_keyed_start(
+                game, game_hands):
+            # Games created before hands were keyed under their game keep
+            # the hands saved back then as Hand entities found by query, and
+            # have any hands saved since keyed; fill in the missing ones.
+
+            query = Hand.query(Hand.game == game.key)
+            legacy_hands = yield query.fetch_async()
+            for hand in legacy_hands:
+                hand_id = Hand.get_id(game, hand.player, hand.state)
+                game_hands.setdefault(hand_id, hand)
+        raise ndb.Return(game_hands)
+
+    @staticmethod
+    def _has_keyed_start(game, game_hands):
+        """Returns whether the game was dealt with keyed hands.
+
+        Starting hands are saved when a game is dealt, so a game with a keyed
+        starting hand has no hands to find by query.
+        """
+        return any(
+            Hand.get_id(game, player_key, 'STARTING') in game_hands
+            for player_key in (game.player_one, game.player_two)
+        )
+
+    def allocate_game_id(self):
+        """Returns an unused Game id."""
+        return Game.allocate_ids(size=1)[0]
+
+    def allocate_game_ids(self, size):
+        """Returns a list of unused Game ids from one allocation."""
+        first, last = Game.allocate_ids(size=size)
+        return range(first, last + 1)
+
+    def transaction(self, function, *args, **kwargs):
+        """Runs a function in a cross-group transaction.
+
+        A function called inside a transaction joins it. Tasks buffered
+        with transactional=True (see notifications.py) are added with the
+        transaction in one batch.
+        """
+        if ndb.in_transaction():
+            return function(*args, **kwargs)
+
+        def run_attempt():
+            dispatcher = notifications.get_dispatcher()
+            dispatcher.begin_transactional()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                dispatcher.discard_transactional()
+                raise
+            dispatcher.flush_transactional()
+            return result
+        return ndb.transaction(run_attempt, xg=True)
+
+    def on_commit(self, callback):
+        """Calls callback after the current transaction commits.
+
+        Outside a transaction callback is called right away.
+        """
+        ndb.get_context().call_on_commit(callback)
+
+
+class MemoryStorage(object):
+    """Keeps User, Game and Hand entities in dictionaries.
+
+    Used to run the game flow at memory speed in load tests and benchmarks
+    and to profile game logic apart from datastore latency. There are no
+    transactions; functions run as is. Pair it with notifications.MemoryQueue
+    to record tasks instead of queueing them.
+
+    Attributes:
+      entities: dictionary of key to entity.
+    """
+    def __init__(self):
+        self.entities = {}
+        self._in_transaction = False
+        self._user_keys_by_name = {}
+        self._ids = itertools.count(1)
+
+    def get(self, key):
+        return self.entities.get(key)
+
+    def get_async(self, key):
+        return Done(self.get(key))
+
+    def get_multi(self, keys):
+        return [self.entities.get(key) for key in keys]
+
+    def put(self, entity):
+        if entity.key is None:
+            entity.key = ndb.Key(type(entity), next(self._ids))
+        if isinstance(entity, User):
+            self._user_keys_by_name[entity.name] = entity.key
+        self.entities[entity.key] = entity
+        return entity.key
+
+    def put_multi(self, entities):
+        return [self.put(entity) for entity in entities]
+
+    def get_user_by_name(self, name):
+        key = self._user_keys_by_name.get(name)
+        return self.entities.get(key) if key is not None else None
+
+    def get_user_by_name_async(self, name):
+        return Done(self.get_user_by_name(name))
+
+    def get_users_by_name(self, names):
+        users = {}
+        for name in names:
+            user = self.get_user_by_name(name)
+            if user is not None:
+                users[name] = user
+        return users
+
+    def create_user(self, name, email):
+        if name in self._user_keys_by_name:
+            return None
+        user = User(name=name, email=email)
+        self.put(user)
+        return user
+
+    def get_game_hands(self, game):
+        game_hands = {}
+        for hand_id in Hand.get_ids(game):
+            hand = self.entities.get(ndb.Key(Hand, hand_id, parent=game.key))
+            if hand is not None:
+                game_hands[hand_id] = hand
+        return game_hands
+
+    def get_game_hands_async(self, game):
+        return Done(self.get_game_hands(game))
+
+    def allocate_game_id(self):
+        return next(self._ids)
+
+    def allocate_game_ids(self, size):
+        return [next(self._ids) for _ in range(size)]
+
+    def transaction(self, function, *args, **kwargs):
+        if self._in_transaction:
+            return function(*args, **kwargs)
+
+        dispatcher = notifications.get_dispatcher()
+        dispatcher.begin_transactional()
+        self._in_transaction = True
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            dispatcher.discard_transactional()
+            raise
+        finally:
+            self._in_transaction = False
+        dispatcher.flush_transactional()
+        return result
+
+    def on_commit(self, callback):
+        callback()
+
+
+_storage = NdbStorage()
+
+
+def get_storage():
+    """Returns the storage backend the game reads and writes through."""
+    return _storage
+
+
+def set_storage(storage):
+    """Replaces the storage backend, e.g. with MemoryStorage for benchmarks.
+
+    Returns:
+      The previous storage backend.
+    """
+    global _storage
+    previous_storage = _storage
+    _storage = storage
+    return previous_storage
+
+
+def transactional(function):
+    """Decorator running a function in a transaction of the current backend."""
+    @functools.wraps(function)
+    def run_in_transaction(*args, **kwargs):
+        return get_storage().transaction(function, *args, **kwargs)
+    return run_in_transaction
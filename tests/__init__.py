@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+
+Unit tests. Run from the project root:
+  python -m unittest discover -s tests -t .
+"""
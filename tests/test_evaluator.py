@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import unittest
+
+import evaluator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def codes(*cards):
+    """Returns the card codes of (name, suit) pairs."""
+    return [evaluator.card_code(name, suit) for name, suit in cards]
+
+
+FULL_HOUSE = codes(
+    ('two', 'spade'), ('two', 'heart'), ('two', 'diamond'),
+    ('nine', 'club'), ('nine', 'spade')
+)
+WHEEL = codes(
+    ('ace', 'spade'), ('two', 'heart'), ('three', 'diamond'),
+    ('four', 'club'), ('five', 'spade')
+)
+ROYAL_FLUSH = codes(
+    ('ten', 'spade'), ('jack', 'spade'), ('queen', 'spade'),
+    ('king', 'spade'), ('ace', 'spade')
+)
+
+
+class EvaluateTest(unittest.TestCase):
+    def test_hand_types(self):
+        self.assertEqual(
+            evaluator.hand_type(evaluator.evaluate(FULL_HOUSE)),
+            evaluator.FULL_HOUSE
+        )
+        self.assertEqual(
+            evaluator.hand_type(evaluator.evaluate(WHEEL)),
+            evaluator.STRAIGHT
+        )
+        self.assertEqual(
+            evaluator.hand_type(evaluator.evaluate(ROYAL_FLUSH)),
+            evaluator.ROYAL_FLUSH
+        )
+
+    def test_wheel_is_the_lowest_straight(self):
+        six_high = codes(
+            ('two', 'spade'), ('three', 'heart'), ('four', 'diamond'),
+            ('five', 'club'), ('six', 'spade')
+        )
+        self.assertLess(
+            evaluator.evaluate(WHEEL), evaluator.evaluate(six_high)
+        )
+
+    def test_five_of_a_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            evaluator.evaluate([0, 1, 2, 3, 0])
+
+    def test_invalid_codes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            evaluator.evaluate([0, 1, 2, 3, 52])
+        with self.assertRaises(ValueError):
+            evaluator.evaluate([-1, 1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            evaluator.evaluate([0, 1, 2, 3])
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+class EvaluateBatchTest(unittest.TestCase):
+    def test_matches_evaluate(self):
+        hands = [FULL_HOUSE, WHEEL, ROYAL_FLUSH, [0, 5, 10, 15, 20]]
+        self.assertEqual(
+            list(evaluator.evaluate_batch(hands)),
+            [evaluator.evaluate(hand) for hand in hands]
+        )
+
+    def test_empty_batch(self):
+        self.assertEqual(
+            len(evaluator.evaluate_batch(numpy.zeros((0, 5), dtype=int))), 0
+        )
+
+    def test_repeated_card_is_rejected(self):
+        for hand in ([0, 1, 2, 3, 0], [0, 0, 4, 8, 12], [51, 51, 1, 2, 3]):
+            with self.assertRaises(ValueError):
+                evaluator.evaluate_batch([FULL_HOUSE, hand])
+
+    def test_card_codes_out_of_range_are_rejected(self):
+        for hand in ([0, 1, 2, 3, 52], [-1, 1, 2, 3, 4]):
+            with self.assertRaises(ValueError):
+                evaluator.evaluate_batch([hand])
+
+    def test_wrong_shape_is_rejected(self):
+        with self.assertRaises(ValueError):
+            evaluator.evaluate_batch([[0, 1, 2, 3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
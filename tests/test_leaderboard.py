@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import unittest
+
+import offline
+offline.install()
+
+from google.appengine.ext import ndb  # noqa
+
+import leaderboard  # noqa
+import notifications  # noqa
+import stats  # noqa
+import storage  # noqa
+from model import PlayerStatsShard  # noqa
+from model import User  # noqa
+
+
+class AddPlayersTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = storage.MemoryStorage()
+        self.previous_storage = storage.set_storage(self.storage)
+        self.previous_queue = notifications.set_queue(
+            notifications.MemoryQueue()
+        )
+
+    def tearDown(self):
+        storage.set_storage(self.previous_storage)
+        notifications.set_queue(self.previous_queue)
+        notifications.get_dispatcher().flush()
+
+    def put_user(self, user_id, wins):
+        user = User(
+            key=ndb.Key(User, user_id),
+            name='player{0}'.format(user_id),
+            email='player{0}@example.com'.format(user_id),
+            wins=wins
+        )
+        self.storage.put(user)
+        return user.key
+
+    def test_adds_legacy_players_once(self):
+        user_keys = [self.put_user(1, 2), self.put_user(2, 1)]
+        leaderboard.add_players(user_keys)
+        leaderboard.add_players(user_keys)
+        self.assertEqual(leaderboard.get_rank(6), 1)
+        self.assertEqual(leaderboard.get_rank(3), 2)
+        self.assertEqual(leaderboard.get_rank(0), 3)
+
+    def test_sync_counts_a_legacy_player_once(self):
+        user_key = self.put_user(1, 2)
+        self.storage.put(
+            PlayerStatsShard(
+                key=ndb.Key(PlayerStatsShard, '1-1'), wins=1
+            )
+        )
+        stats.sync_user(user_key)
+        leaderboard.add_players([user_key])
+        self.assertEqual(leaderboard.get_rank(9), 1)
+        self.assertEqual(leaderboard.get_rank(6), 2)
+        self.assertEqual(leaderboard.get_rank(0), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
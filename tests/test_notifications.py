@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import unittest
+
+import offline
+offline.install()
+
+from google.appengine.api import taskqueue  # noqa
+
+import notifications  # noqa
+from storage import MemoryStorage  # noqa
+
+
+class NotificationDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = notifications.MemoryQueue()
+        self.previous_queue = notifications.set_queue(self.queue)
+        self.dispatcher = notifications.NotificationDispatcher()
+        self.storage = MemoryStorage()
+
+    def tearDown(self):
+        notifications.set_queue(self.previous_queue)
+
+    def get_urls(self):
+        return [task.url for task in self.queue.tasks]
+
+    def test_tasks_wait_for_flush(self):
+        self.dispatcher.add('/a', {})
+        self.dispatcher.add('/b', {})
+        self.assertEqual(self.get_urls(), [])
+        self.dispatcher.flush()
+        self.assertEqual(self.get_urls(), ['/a', '/b'])
+        self.assertEqual(self.queue.add_calls, 1)
+
+    def test_transactional_task_outside_transaction_is_refused(self):
+        with self.assertRaises(taskqueue.BadTransactionStateError):
+            self.dispatcher.add('/a', {}, transactional=True)
+
+    def test_transactional_tasks_are_added_on_commit(self):
+        self.dispatcher.begin_transactional()
+        self.dispatcher.add('/a', {}, transactional=True)
+        self.assertEqual(self.get_urls(), [])
+        self.dispatcher.flush_transactional()
+        self.assertEqual(self.get_urls(), ['/a'])
+        with self.assertRaises(taskqueue.BadTransactionStateError):
+            self.dispatcher.add('/b', {}, transactional=True)
+
+    def test_failed_transaction_drops_its_tasks(self):
+        def fail():
+            notifications.add('/a', {}, transactional=True)
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            self.storage.transaction(fail)
+        self.storage.transaction(
+            lambda: notifications.add('/b', {}, transactional=True)
+        )
+        self.assertEqual(self.get_urls(), ['/b'])
+
+    def test_tasks_with_the_same_name_are_added_once(self):
+        self.dispatcher.add('/a', {'n': 1}, name='same')
+        self.dispatcher.add('/a', {'n': 2}, name='same')
+        self.dispatcher.add('/b', {})
+        self.dispatcher.flush()
+        self.assertEqual(
+            [task.params for task in self.queue.tasks], [{'n': 1}, {}]
+        )
+
+    def test_task_named_in_an_earlier_batch_is_skipped(self):
+        self.dispatcher.add('/a', {}, name='same')
+        self.dispatcher.flush()
+        self.dispatcher.add('/a', {}, name='same')
+        self.dispatcher.add('/b', {})
+        self.dispatcher.flush()
+        self.assertEqual(self.get_urls(), ['/a', '/b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
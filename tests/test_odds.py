@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import random
+import unittest
+
+import offline
+offline.install()
+
+from game import Card  # noqa
+from odds import simulate_discard_odds  # noqa
+
+HAND = [
+    Card('two', 'spade'), Card('two', 'heart'), Card('seven', 'diamond'),
+    Card('nine', 'club'), Card('king', 'spade')
+]
+
+
+class SimulateDiscardOddsTest(unittest.TestCase):
+    def test_every_exchange_is_scored(self):
+        trials, exchange_odds = simulate_discard_odds(
+            HAND, trials=200, time_budget=60, rng=random.Random(1)
+        )
+        self.assertEqual(trials, 200)
+        self.assertEqual(len(exchange_odds), 32)
+        for discards, win_probability, tie_probability in exchange_odds:
+            self.assertTrue(0 <= win_probability + tie_probability <= 1)
+
+    def test_no_trials_is_rejected(self):
+        for trials in (0, -1):
+            with self.assertRaises(ValueError):
+                simulate_discard_odds(HAND, trials=trials)
+
+    def test_spent_time_budget_still_runs_one_trial(self):
+        trials, _ = simulate_discard_odds(HAND, trials=200, time_budget=-1)
+        self.assertGreaterEqual(trials, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Copyright 2016 Brian Quach
+Licensed under MIT (https://github.com/brianquach/udacity-nano-fullstack-conference/blob/master/LICENSE)  # noqa
+"""
+import unittest
+
+try:
+    from google.appengine.datastore import datastore_stub_util
+    from google.appengine.ext import testbed
+except ImportError:
+    testbed = None
+else:
+    from google.appengine.ext import ndb
+
+    from model import Backfill
+    from model import Game
+    from model import Hand
+    from model import User
+    from storage import MemoryStorage
+    from storage import NdbStorage
+
+CARDS = b'\x00\x05\x0a\x0f\x14'
+
+
+@unittest.skipIf(testbed is None, 'The App Engine SDK is not installed.')
+class GetGameHandsTest(unittest.TestCase):
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1
+        )
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+        ndb.get_context().clear_cache()
+
+        self.player_one = User(name='one', email='one@example.com').put()
+        self.player_two = User(name='two', email='two@example.com').put()
+        self.game = Game(
+            player_one=self.player_one,
+            player_two=self.player_two,
+            active_player=self.player_one
+        )
+        self.game.put()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def put_keyed_hand(self, player_key, state):
+        return Hand(
+            parent=self.game.key,
+            id=Hand.get_id(self.game, player_key, state),
+            player=player_key,
+            game=self.game.key,
+            hand=CARDS,
+            state=state
+        ).put()
+
+    def put_legacy_hand(self, player_key, state):
+        """Saves a hand the way games created before keyed hands did."""
+        return Hand(
+            player=player_key,
+            game=self.game.key,
+            hand=CARDS,
+            state=state
+        ).put()
+
+    def get_hand_keys(self):
+        hands = NdbStorage().get_game_hands(self.game)
+        return dict((hand_id, hand.key) for hand_id, hand in hands.items())
+
+    def test_keyed_hands(self):
+        p1_start = self.put_keyed_hand(self.player_one, 'STARTING')
+        p2_start = self.put_keyed_hand(self.player_two, 'STARTING')
+        p1_end = self.put_keyed_hand(self.player_one, 'ENDING')
+        self.assertEqual(
+            self.get_hand_keys(),
+            {'p1_start': p1_start, 'p2_start': p2_start, 'p1_end': p1_end}
+        )
+
+    def test_legacy_hands(self):
+        p1_start = self.put_legacy_hand(self.player_one, 'STARTING')
+        p2_start = self.put_legacy_hand(self.player_two, 'STARTING')
+        self.assertEqual(
+            self.get_hand_keys(),
+            {'p1_start': p1_start, 'p2_start': p2_start}
+        )
+
+    def test_legacy_game_with_keyed_hands_saved_since(self):
+        p1_start = self.put_legacy_hand(self.player_one, 'STARTING')
+        p2_start = self.put_legacy_hand(self.player_two, 'STARTING')
+        p1_end = self.put_keyed_hand(self.player_one, 'ENDING')
+        p2_end = self.put_keyed_hand(self.player_two, 'ENDING')
+        self.assertEqual(
+            self.get_hand_keys(),
+            {
+                'p1_start': p1_start,
+                'p2_start': p2_start,
+                'p1_end': p1_end,
+                'p2_end': p2_end
+            }
+        )
+
+    def test_keyed_hand_is_preferred_to_legacy_hand(self):
+        self.put_legacy_hand(self.player_one, 'STARTING')
+        self.put_legacy_hand(self.player_two, 'STARTING')
+        self.put_legacy_hand(self.player_one, 'ENDING')
+        p1_end = self.put_keyed_hand(self.player_one, 'ENDING')
+        self.assertEqual(self.get_hand_keys()['p1_end'], p1_end)
+
+    def test_memory_storage_matches(self):
+        storage = MemoryStorage()
+        game = Game(
+            key=ndb.Key(Game, 1),
+            player_one=self.player_one,
+            player_two=self.player_two
+        )
+        hand = Hand(
+            parent=game.key,
+            id=Hand.get_id(game, self.player_two, 'STARTING'),
+            player=self.player_two,
+            game=game.key,
+            hand=CARDS,
+            state='STARTING'
+        )
+        storage.put(hand)
+        self.assertEqual(storage.get_game_hands(game), {'p2_start': hand})
+
+
+@unittest.skipIf(testbed is None, 'The App Engine SDK is not installed.')
+class UserNameTest(unittest.TestCase):
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1
+        )
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+        ndb.get_context().clear_cache()
+
+        # A User created before names were reserved with UserName.
+
+        self.legacy_key = User(name='old', email='old@example.com').put()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def test_legacy_name_is_taken_before_backfill(self):
+        storage = NdbStorage()
+        self.assertEqual(storage.get_user_by_name('old').key, self.legacy_key)
+        self.assertIsNone(storage.create_user('old', 'new@example.com'))
+
+    def test_name_query_stops_after_backfill(self):
+        Backfill(key=Backfill.get_key(Backfill.USER_NAMES)).put()
+        storage = NdbStorage()
+        self.assertIsNone(storage.get_user_by_name('old'))
+        self.assertIsNotNone(storage.create_user('new', 'new@example.com'))
+        self.assertIsNotNone(storage.get_user_by_name('new'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,13 @@ import endpoints
 
 from google.appengine.ext import ndb
 
+import cache
+from storage import get_storage
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_NEW_GAMES = 1000
+
 
 def get_by_urlsafe(urlsafe, model):
     """Returns an ndb.Model entity that the urlsafe key points to. Checks
@@ -21,8 +28,30 @@ def get_by_urlsafe(urlsafe, model):
         exists.
     Raises:
         ValueError:"""
+    entity = get_storage().get(_get_key(urlsafe))
+    return _check_kind(entity, model)
+
+
+def get_by_urlsafe_and_name(urlsafe, model, name):
+    """Returns the entity a urlsafe key points to and the User with a name.
+        Both are looked up at the same time; see get_by_urlsafe. Only the
+        User is read through the cache.
+    Args:
+        urlsafe: A urlsafe key string
+        model: The expected entity kind
+        name: A player name
+    Returns:
+        A tuple of the entity (or None) and the User (or None).
+    Raises:
+        ValueError:"""
+    entity, user = cache.get_entity_and_user_by_name(_get_key(urlsafe), name)
+    return _check_kind(entity, model), user
+
+
+def _get_key(urlsafe):
+    """Returns the ndb.Key of a urlsafe key string."""
     try:
-        key = ndb.Key(urlsafe=urlsafe)
+        return ndb.Key(urlsafe=urlsafe)
     except TypeError:
         raise endpoints.BadRequestException('Invalid Key')
     except Exception, e:
@@ -31,9 +60,37 @@ def get_by_urlsafe(urlsafe, model):
         else:
             raise
 
-    entity = key.get()
+
+def _check_kind(entity, model):
+    """Returns the entity unless it is not a model entity."""
     if not entity:
         return None
     if not isinstance(entity, model):
         raise ValueError('Incorrect Kind')
     return entity
+
+
+def get_page_options(limit, urlsafe_cursor):
+    """Returns the page size and start cursor of a paged request.
+    Args:
+        limit: The requested page size or None for DEFAULT_PAGE_SIZE. Capped
+            at MAX_PAGE_SIZE.
+        urlsafe_cursor: The next_cursor of the previous page or None for the
+            first page.
+    Returns:
+        A tuple of the page size and an ndb.Cursor or None.
+    Raises:
+        BadRequestException: The limit is not positive or the cursor is
+            malformed."""
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise endpoints.BadRequestException('Limit must be positive')
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    if not urlsafe_cursor:
+        return limit, None
+    try:
+        return limit, ndb.Cursor(urlsafe=urlsafe_cursor)
+    except Exception:
+        raise endpoints.BadRequestException('Invalid cursor')